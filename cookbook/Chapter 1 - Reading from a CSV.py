@@ -1,7 +1,6 @@
 # %%
-import pandas as pd
-import matplotlib.pyplot as plt
-
+# pandas and matplotlib are only imported when first used, see bootstrap.py
+from bootstrap import pd, plt
 
 # %%
 # Reading data from a csv file
@@ -67,3 +66,17 @@ fixed_df["Berri 1"].plot()
 fixed_df.plot(figsize=(15, 10))
 
 # TODO: how would you do this with a Polars data frame? With Polars data frames you might have to use the Seaborn library and it mmight not work out of the box as with pandas.
+
+# %%
+# `downsample.plot` plots polars data frames with matplotlib. It first reduces every column to a couple of points per
+# pixel of the figure (keeping the peaks), so the plot stays fast on years of data.
+import polars as pl
+from downsample import plot
+
+pl_fixed_df = pl.read_csv(
+    "../data/bikes.csv", separator=";", encoding="latin1"
+).with_columns(pl.col("Date").str.to_date("%d/%m/%Y"))
+plot(pl_fixed_df, "Date", "Berri 1")
+plot(
+    pl_fixed_df, "Date", pl_fixed_df.columns[1:], ax=plt.figure(figsize=(15, 10)).gca()
+)
@@ -1,7 +1,6 @@
 # %%
-import pandas as pd
-import matplotlib.pyplot as plt
-import polars as pl
+# pandas, matplotlib and polars are only imported when first used, see bootstrap.py
+from bootstrap import pd, pl, plt
 
 # %%
 # We're going to use a new dataset here, to demonstrate how to deal with larger datasets. This is a subset of the of 311 service requests from [NYC Open Data](https://nycopendata.socrata.com/Social-Services/311-Service-Requests-from-2010-to-Present/erm2-nwe9).
@@ -15,6 +14,14 @@ complaints.head()
 # you cannot exactly do the same in Polars but you can read about some other solutions here:
 # see a discussion about dtype argument here: https://github.com/pola-rs/polars/issues/8230
 
+# %%
+# Parsing the CSV is the slowest step of this chapter. `nyc311.load_complaints` converts the CSV once into a typed
+# Arrow IPC cache (dates as Datetime, Borough and Complaint Type as Categorical) and memory-maps it on every later run.
+from nyc311 import load_complaints
+
+pl_complaints_typed = load_complaints()
+pl_complaints_typed.schema
+
 # %%
 # Selecting columns:
 complaints["Complaint Type"]
@@ -52,6 +59,13 @@ complaint_counts[:10]
 # %%
 # TODO: rewrite the above using the polars library
 
+# %%
+# value_counts needs the whole column in memory. `topk.top_k` reads the CSV in batches and only keeps a running count
+# table; with a `capacity` it keeps at most that many values and reports how far off each count can be.
+from topk import top_k
+
+top_k("../data/311-service-requests.csv", "Complaint Type", k=10, capacity=1000)
+
 # %%
 # Plot the top 10 most common complaints
 complaint_counts[:10].plot(kind="bar")
@@ -1,16 +1,14 @@
 # %%
-import pandas as pd
-import matplotlib.pyplot as plt
-
+# pandas and matplotlib are only imported when first used, see bootstrap.py
+from bootstrap import configure, pd, plt
 
 # Make the graphs a bit prettier, and bigger
-plt.style.use("ggplot")
-plt.rcParams["figure.figsize"] = (15, 5)
-
-# This is necessary to show lots of columns in pandas 0.12.
-# Not necessary in pandas 0.13.
-pd.set_option("display.width", 5000)
-pd.set_option("display.max_columns", 60)
+# (the display options were necessary to show lots of columns in pandas 0.12, not in pandas 0.13)
+configure(
+    style="ggplot",
+    rc={"figure.figsize": (15, 5)},
+    pandas_options={"display.width": 5000, "display.max_columns": 60},
+)
 
 # %%
 # Let's continue with our NYC 311 service requests example.
@@ -20,6 +18,14 @@ complaints = pd.read_csv("../data/311-service-requests.csv", dtype="unicode")
 # %%
 # TODO: rewrite the above using the polars library (you might have to import it above) and call the data frame pl_complaints
 
+# %%
+# Parsing the CSV is the slowest step of this chapter. `nyc311.load_complaints` converts the CSV once into a typed
+# Arrow IPC cache (dates as Datetime, Borough and Complaint Type as Categorical) and memory-maps it on every later run.
+from nyc311 import load_complaints
+
+pl_complaints_typed = load_complaints()
+pl_complaints_typed.schema
+
 # %%
 # 3.1 Selecting only noise complaints
 # I'd like to know which borough has the most noise complaints. First, we'll take a look at the data to see what it looks like:
@@ -79,6 +85,33 @@ noise_complaint_counts / complaint_counts.astype(float)
 # TODO: rewrite the above using the polars library
 
 
+# %%
+# The two value_counts above scan the data twice. `ratios.grouped_ratio` counts the noise complaints and all complaints
+# of each borough in one aggregation, and `ratios.ratio_matrix` does it for every complaint type at once.
+import polars as pl
+from ratios import grouped_ratio, ratio_matrix
+
+grouped_ratio(
+    pl_complaints_typed,
+    "Borough",
+    pl.col("Complaint Type") == "Noise - Street/Sidewalk",
+)
+
+# %%
+ratio_matrix(pl_complaints_typed, "Borough", "Complaint Type")
+
+# %%
+# Every `==` above scans a whole column again. `bitmap_index.BitmapIndex` scans "Complaint Type" and "Borough" once and
+# keeps one bitset of matching rows per value; masks are then combined with `&`, `|` and `~` on those bitsets, and
+# recently used combinations are cached.
+from bitmap_index import BitmapIndex
+
+index = BitmapIndex(pl_complaints_typed, ["Complaint Type", "Borough"])
+noise = index.eq("Complaint Type", "Noise - Street/Sidewalk")
+index.filter(noise & index.eq("Borough", "BROOKLYN"))
+index.count(noise & ~index.isin("Borough", ["BROOKLYN", "MANHATTAN"]))
+
+
 # %%
 # Plot the results
 (noise_complaint_counts / complaint_counts.astype(float)).plot(kind="bar")
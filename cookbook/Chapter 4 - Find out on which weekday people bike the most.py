@@ -1,16 +1,14 @@
 # %%
-import pandas as pd
-import matplotlib.pyplot as plt
+# pandas and matplotlib are only imported when first used, see bootstrap.py
+from bootstrap import configure, pd, plt
 
 # Make the graphs a bit prettier, and bigger
-plt.style.use("ggplot")
-plt.rcParams["figure.figsize"] = (15, 5)
-plt.rcParams["font.family"] = "sans-serif"
-
-# This is necessary to show lots of columns in pandas 0.12.
-# Not necessary in pandas 0.13.
-pd.set_option("display.width", 5000)
-pd.set_option("display.max_columns", 60)
+# (the display options were necessary to show lots of columns in pandas 0.12, not in pandas 0.13)
+configure(
+    style="ggplot",
+    rc={"figure.figsize": (15, 5), "font.family": "sans-serif"},
+    pandas_options={"display.width": 5000, "display.max_columns": 60},
+)
 
 # %% Load the data
 bikes = pd.read_csv(
@@ -26,6 +24,20 @@ plt.show()
 
 # TODO: Load the data using Polars
 
+# %%
+# `downsample.plot` draws a polars column reduced to the width of the figure, so long series plot quickly.
+import polars as pl
+from downsample import plot
+
+plot(
+    pl.read_csv("../data/bikes.csv", separator=";", encoding="latin1").with_columns(
+        pl.col("Date").str.to_date("%d/%m/%Y")
+    ),
+    "Date",
+    "Berri 1",
+)
+plt.show()
+
 # %% Plot Berri 1 data
 # Next up, we're just going to look at the Berri bike path. Berri is a street in Montreal, with a pretty important bike path. I use it mostly on my way to the library now, but I used to take it to work sometimes when I worked in Old Montreal.
 
@@ -93,5 +105,26 @@ plt.show()
 
 # TODO: Plot results using Polars and matplotlib
 
+# %%
+# `calendar_dim` keeps a precomputed table of every day with its weekday, weekday name, month, ISO week and so on.
+# `calendar_features` looks them up by the day number instead of taking every date apart again, and `reindex_days`
+# puts a series with missing days onto every day of a range, here the whole of 2012.
+import polars as pl
+from calendar_dim import calendar_features, reindex_days
+
+pl_berri_bikes = pl.read_csv(
+    "../data/bikes.csv", separator=";", encoding="latin1"
+).select(pl.col("Date").str.to_date("%d/%m/%Y"), "Berri 1")
+pl_berri_bikes.with_columns(calendar_features("Date", "weekday_name")).group_by(
+    "weekday_name"
+).agg(pl.col("Berri 1").sum()).sort("weekday_name")
+
+# %%
+# bikes.csv only has 310 days of 2012; the other 56 are added with 0 bikes
+berri_bikes_2012 = reindex_days(
+    pl_berri_bikes, "Date", fill="zero", start="2012-01-01", end="2012-12-31"
+)
+pl_berri_bikes.height, berri_bikes_2012.height
+
 # %% Final message
 print("Analysis complete!")
@@ -1,11 +1,8 @@
 # %%
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
+# pandas, matplotlib and numpy are only imported when first used, see bootstrap.py
+from bootstrap import configure, np, pd, plt
 
-plt.style.use("ggplot")
-plt.rcParams["figure.figsize"] = (15, 3)
-plt.rcParams["font.family"] = "sans-serif"
+configure(style="ggplot", rc={"figure.figsize": (15, 3), "font.family": "sans-serif"})
 
 # %%
 # By the end of this chapter, we're going to have downloaded all of Canada's weather data for 2012, and saved it to a CSV. We'll do this by downloading it one month at a time, and then combining all the months together.
@@ -17,6 +14,27 @@ plt.show()
 
 # TODO: rewrite using Polars
 
+# %%
+# station_name, climate_id, longitude and latitude hold the same value on every hourly row. `schema_optimizer` samples
+# the file, proposes the narrowest dtypes (Enum, UInt8, Float32, Datetime, and flags constant columns) and reads it
+# with them; `memory_report` compares the memory of each column with the all-string read.
+import polars as pl
+from schema_optimizer import (
+    memory_report,
+    proposal_table,
+    propose_dtypes,
+    read_optimized,
+)
+
+weather_dtypes = propose_dtypes("../data/weather_2012.csv")
+proposal_table(weather_dtypes)
+
+# %%
+pl_weather_2012_final = read_optimized("../data/weather_2012.csv", weather_dtypes)
+memory_report(
+    pl.read_csv("../data/weather_2012.csv", infer_schema=False), pl_weather_2012_final
+)
+
 # %%
 # Okay, let's start from the beginning.
 # We're going to get the data for March 2012, and clean it up
@@ -128,6 +146,20 @@ plt.show()
 
 # TODO: redo this using polars
 
+# %%
+# `calendar_dim.calendar_features` gives the hour (and the weekday, month, ... from a precomputed calendar table).
+import polars as pl
+from calendar_dim import calendar_features
+
+(
+    pl.read_csv("../data/weather_2012.csv", try_parse_dates=True)
+    .filter(pl.col("date_time").dt.month() == 3)
+    .with_columns(calendar_features("date_time", "hour"))
+    .group_by("hour")
+    .agg(pl.col("temperature_c").median())
+    .sort("hour")
+)
+
 # %%
 # Okay, so what if we want the data for the whole year? Ideally the API would just let us download that, but I couldn't figure out a way to do that.
 # First, let's put our work from above into a function that gets the weather for a given month.
@@ -181,8 +213,55 @@ weather_2012.head()
 
 # TODO: do the same with polars
 
+# %%
+# Downloading the months one after the other means waiting for twelve round trips in a row.
+# `weather.download_weather_year` fetches them in parallel (retrying failed requests) and keeps every month in
+# ../data/.cache/weather, so running this cell again only downloads the months it has not seen yet.
+# Run `python weather_standin.py` and pass base_url="http://127.0.0.1:8000" to try it without internet access.
+from weather import download_weather_year
+
+pl_weather_2012 = download_weather_year(2012)
+pl_weather_2012.head()
+
+# %%
+# All 8,784 hours of the year don't fit in the width of the plot anyway. `downsample.plot` keeps the ones that shape
+# the line (Largest-Triangle-Three-Buckets) before handing them to matplotlib.
+from downsample import plot
+
+plot(
+    pl_weather_2012, "date_time", "temperature_c", ax=plt.figure(figsize=(15, 6)).gca()
+)
+
 # %%
 # Now, let's save the data.
 weather_2012.to_csv("../data/weather_2012.csv")
 
 # TODO: use polars to save the data.
+
+# %%
+# For many months or many years, keeping every month in a list and concatenating them needs all of them in memory
+# (twice, during the concat). `weather.ingest_weather_months` instead writes each cleaned month to its own Parquet
+# file as soon as it arrives, in ../data/weather_parquet/station_id=.../year=.../month=..., and reads it back lazily.
+from weather import ingest_weather_months, scan_weather_dataset
+
+ingest_weather_months([(5415, 2012, month) for month in range(1, 13)])
+scan_weather_dataset().collect().head()
+
+# %%
+# `weather.backfill` does this for lists of stations and ranges of years. It remembers the months it already stored
+# (in the dataset's _manifest.json), so running it again only downloads what is missing, and it parses the
+# downloads in several processes. Here against the local stand-in server, into a temporary folder so that its
+# made-up data stays out of ../data/weather_parquet:
+import tempfile
+
+from weather import backfill
+from weather_standin import StandInServer
+
+# The parser processes are spawned and import this file again, so run as a script it has to start them only
+# from the main module.
+if __name__ == "__main__":
+    with StandInServer() as server, tempfile.TemporaryDirectory() as standin_dataset:
+        summary = backfill(
+            [5415, 5420], range(2011, 2013), standin_dataset, base_url=server.url
+        )
+    print(len(summary["ingested"]), len(summary["skipped"]), summary["failed"])
@@ -1,11 +1,8 @@
 # %%
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
+# pandas, matplotlib and numpy are only imported when first used, see bootstrap.py
+from bootstrap import configure, np, pd, plt
 
-plt.style.use("ggplot")
-plt.rcParams["figure.figsize"] = (15, 3)
-plt.rcParams["font.family"] = "sans-serif"
+configure(style="ggplot", rc={"figure.figsize": (15, 3), "font.family": "sans-serif"})
 
 
 # %%
@@ -31,6 +28,16 @@ plt.show()
 
 # TODO: do the same with polars
 
+# %%
+# The weather column only has a few dozen distinct values, so there is no need to search every row for "Snow".
+# `dictionary_strings.encode` stores the column as a polars Enum; `contains` then checks each distinct value once
+# and looks the answer up for every row through the Enum's integer codes.
+import polars as pl
+from dictionary_strings import encode, contains
+
+pl_weather_encoded = encode(pl.read_csv("../data/weather_2012.csv"), "weather")
+pl_weather_encoded.select(contains(pl_weather_encoded, "weather", "Snow"))
+
 
 # %%
 # If we wanted the median temperature each month, we could use the `resample()` method like this:
@@ -53,3 +60,55 @@ plt.show()
 # So now we know! In 2012, December was the snowiest month. Also, this graph suggests something that I feel -- it starts snowing pretty abruptly in November, and then tapers off slowly and takes a long time to stop, with the last snow usually being in April or May.
 
 # TODO: please do the same in Polars
+
+# %%
+# Both monthly numbers can also be computed lazily in polars with `group_by_dynamic`, in a single pass.
+# `resample.IncrementalResampler` keeps per-month partial aggregates, so when new hourly rows arrive,
+# `update(new_rows)` only recomputes the months they fall into instead of the whole year.
+import polars as pl
+from resample import resample
+
+monthly = resample(
+    pl.scan_csv("../data/weather_2012.csv", try_parse_dates=True),
+    "month",
+    pl.col("temperature_c").median().alias("median_temperature_c"),
+    pl.col("weather").str.contains("Snow").mean().alias("snow_fraction"),
+).collect()
+monthly
+
+# %%
+# To plot the polars result with pandas, `arrow_bridge.to_pandas` hands the columns over as pyarrow-backed pandas
+# columns that share polars' memory, instead of copying them like `DataFrame.to_pandas()` does.
+# `count_copies` shows how many bytes a conversion really duplicated.
+from arrow_bridge import count_copies, to_pandas
+
+with count_copies() as copies:
+    pd_monthly = to_pandas(monthly)
+pd_monthly.set_index("date_time")["snow_fraction"].plot(kind="bar")
+plt.show()
+copies.report()
+
+# %%
+# `arrow_bridge.to_polars` goes the other way; a named index such as `date_time` comes back as the first column.
+from arrow_bridge import to_polars
+
+with count_copies() as copies:
+    round_trip = to_polars(pd_monthly.set_index("date_time"))
+round_trip.equals(monthly), copies.report()
+
+# %%
+# Monthly questions don't need the whole year. `weather.write_weather_dataset` stores the weather as one Parquet file
+# per station and month (../data/weather_parquet/station_id=.../year=.../month=...), and `weather.query_weather` only
+# opens the files of the months asked for, skipping row groups within them by their min/max statistics.
+from weather import query_weather, write_weather_dataset
+
+write_weather_dataset(
+    pl.read_csv(
+        "../data/weather_2012.csv",
+        try_parse_dates=True,
+        schema_overrides={"climate_id": pl.String},
+    )
+)
+query_weather(
+    pl.col("weather").str.contains("Snow"), start="2012-12-01", end="2013-01-01"
+).select(pl.len()).collect()
@@ -1,13 +1,10 @@
 # %%
 # The usual preamble
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
+# pandas, matplotlib and numpy are only imported when first used, see bootstrap.py
+from bootstrap import configure, np, pd, plt
 
 # Make the graphs a bit prettier, and bigger
-plt.style.use("ggplot")
-plt.rcParams["figure.figsize"] = (15, 5)
-plt.rcParams["font.family"] = "sans-serif"
+configure(style="ggplot", rc={"figure.figsize": (15, 5), "font.family": "sans-serif"})
 
 
 # %%
@@ -19,6 +16,14 @@ requests.head()
 # TODO: load the data with Polars
 
 
+# %%
+# Parsing the CSV is the slowest step of this chapter. `nyc311.load_complaints` converts the CSV once into a typed
+# Arrow IPC cache (dates as Datetime, Borough and Complaint Type as Categorical) and memory-maps it on every later run.
+from nyc311 import load_complaints
+
+pl_complaints_typed = load_complaints()
+pl_complaints_typed.schema
+
 # %%
 # How to know if your data is messy?
 # We're going to look at a few columns here. I know already that there are some problems with the zip code, so let's look at that first.
@@ -154,3 +159,53 @@ requests["Incident Zip"].unique()
 # TODO: please implement this with Polars
 
 # %%
+# In polars the whole zip clean-up fits in one expression, `nyc311.normalize_zip`. `nyc311.clean_zips` also looks
+# up the state and region of every zip from its first three digits (a 1000-entry table), so "far away" complaints
+# can be found without testing prefixes one by one.
+import polars as pl
+from nyc311 import clean_zips
+
+pl_requests = clean_zips(
+    pl.read_csv("../data/311-service-requests.csv", infer_schema=False)
+)
+pl_requests.filter(pl.col("is_far")).select(
+    "Incident Zip", "zip_state", "zip_region", "City"
+)
+
+# %%
+# This chapter reads the same CSV over and over. `cell_cache.memoize` stores what a function returns in ../data/.cache/cells,
+# keyed on its source code, its arguments and the contents of the files it reads, so re-running the cell is instant until
+# either the function or the CSV changes.
+from cell_cache import memoize
+
+
+@memoize
+def load_requests(path):
+    return clean_zips(pl.read_csv(path, infer_schema=False))
+
+
+pl_requests = load_requests("../data/311-service-requests.csv")
+
+# %%
+# For 311 extracts that don't fit in memory, `nyc311.clean_requests` is the whole clean-up above as one lazy query on
+# `scan_csv` (with the na_values applied while scanning). `sink_clean_requests` streams it into a Parquet file batch by
+# batch, and `zip_report` runs the checks of this chapter (dashes, long zips, unique zips, cities) in one streaming pass.
+from nyc311 import clean_requests, scan_requests, sink_clean_requests, zip_report
+
+sink_clean_requests("../data/311-service-requests.csv")
+report = zip_report(clean_requests(scan_requests("../data/311-service-requests.csv")))
+report["city_counts"]
+
+# %%
+# Reading with `dtype="unicode"` keeps all 52 columns as strings, although most of them are empty, dates or a few
+# repeated values. `schema_optimizer.read_optimized` reads the file with dtypes proposed from a sample (Incident Zip
+# stays text because of its leading zeros) and takes about a tenth of the memory.
+from schema_optimizer import memory_report, read_optimized
+
+pl_requests_optimized = read_optimized("../data/311-service-requests.csv")
+memory_report(
+    pl.read_csv("../data/311-service-requests.csv", infer_schema=False),
+    pl_requests_optimized,
+)
+
+# %%
@@ -1,5 +1,6 @@
 # %%
-import pandas as pd
+# pandas is only imported when first used, see bootstrap.py
+from bootstrap import pd
 
 # %%
 # Parsing Unix timestamps
@@ -15,6 +16,14 @@ popcon[:5]
 
 # TODO: please reimplement this using Polars
 
+# %%
+# `popcon.read_report` reads the header and trailer lines as metadata instead of as column names and data,
+# and parses atime/ctime straight from integers into Datetime columns.
+from popcon import read_report
+
+popcon_metadata, pl_popcon = read_report("../data/popularity-contest")
+popcon_metadata, pl_popcon[:5]
+
 
 # %%
 # The magical part about parsing timestamps in pandas is that numpy datetimes are already stored as Unix timestamps. So all we need to do is tell pandas that these integers are actually datetimes -- it doesn't need to do any conversion at all.
@@ -48,5 +57,15 @@ nonlibraries.sort_values("ctime", ascending=False)[:10]
 
 # TODO: please reimplement this using Polars
 
+# %%
+# `popcon.newest_packages` runs the same query on the raw file: "1970-01-01" becomes an integer comparison on the
+# epoch seconds inside the scan, all name exclusions are matched at once, and only the 10 newest rows are selected
+# instead of sorting them all; those 10 are then sorted newest first.
+from popcon import newest_packages
+
+newest_packages(
+    "../data/popularity-contest", n=10, accessed_after="1970-01-01", exclude=["lib"]
+)
+
 
 # The whole message here is that if you have a timestamp in seconds or milliseconds or nanoseconds, then you can just "cast" it to a `'datetime64[the-right-thing]'` and pandas/numpy will take care of the rest.
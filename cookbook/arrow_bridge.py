@@ -0,0 +1,176 @@
+"""Move frames between pandas and polars through Arrow, without copying.
+
+The chapters keep a pandas frame next to its polars twin and convert
+between them to plot. ``pl.DataFrame.to_pandas()`` and ``pl.from_pandas()``
+copy every column into NumPy arrays and back. Going through Arrow instead,
+with pyarrow-backed pandas dtypes (``int64[pyarrow]``, ...), both sides can
+share the same buffers:
+
+    from arrow_bridge import to_pandas, to_polars
+
+    weather_2012 = to_pandas(pl_weather_2012)  # numbers and dates are not copied
+    pl_weather_2012 = to_polars(weather_2012)
+
+Numeric, boolean and temporal columns are shared in both directions.
+Strings are the exception: polars stores them as string views, which
+pandas' ``.str`` methods do not support, so ``to_pandas`` writes them out
+as ``large_string`` (one copy) unless ``string_views=True``; on the way
+back polars only builds its 16-byte views and reuses the character data.
+
+To see what a conversion really duplicates, wrap it in ``count_copies``:
+
+    with count_copies() as copies:
+        weather_2012 = to_pandas(pl_weather_2012)
+    copies.report()  # bytes per column, and how many of them were copied
+"""
+
+import contextlib
+
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+
+# callbacks that get (conversion, source, target) after every conversion
+COPY_HOOKS = []
+
+
+def _without_string_views(arrow_type):
+    if pa.types.is_string_view(arrow_type):
+        return pa.large_string()
+    if pa.types.is_binary_view(arrow_type):
+        return pa.large_binary()
+    if pa.types.is_dictionary(arrow_type):
+        return pa.dictionary(
+            arrow_type.index_type, _without_string_views(arrow_type.value_type)
+        )
+    return arrow_type
+
+
+def to_pandas(frame, string_views=False):
+    """A pandas DataFrame with pyarrow dtypes sharing ``frame``'s buffers.
+
+    With ``string_views=True`` strings stay string views and are not copied
+    either, but most ``.str`` methods then fail on them in pandas.
+    """
+    table = frame.to_arrow(compat_level=pl.CompatLevel.newest())
+    if not string_views:
+        schema = pa.schema(
+            [
+                field.with_type(_without_string_views(field.type))
+                for field in table.schema
+            ]
+        )
+        if schema != table.schema:
+            table = table.cast(schema)
+    result = table.to_pandas(types_mapper=pd.ArrowDtype)
+    _notify("polars->pandas", frame, result)
+    return result
+
+
+def to_polars(frame):
+    """A polars DataFrame sharing the Arrow buffers of a pandas ``frame``.
+
+    Columns with NumPy dtypes are converted by Arrow as usual (zero-copy for
+    numbers without missing values); pyarrow-backed columns are passed
+    through. The chunks are kept as they are instead of being merged. A
+    named index, such as the chapters' ``date_time``, becomes a column.
+    """
+    index_names = [name for name in frame.index.names if name is not None]
+    table = pa.Table.from_pandas(frame, preserve_index=bool(index_names))
+    if index_names:
+        # Arrow appends the index after the columns; put it first, like reset_index
+        table = table.select(
+            index_names
+            + [name for name in table.column_names if name not in index_names]
+        )
+    result = pl.from_arrow(table, rechunk=False)
+    _notify("pandas->polars", frame, result)
+    return result
+
+
+def buffers(column):
+    """(address, size) of the memory buffers behind a pandas or polars column."""
+    if isinstance(column, pl.Series):
+        # Series.to_arrow merges the chunks into a new array, so go chunk by chunk
+        chunks = [
+            chunk.to_arrow(compat_level=pl.CompatLevel.newest())
+            for chunk in column.get_chunks()
+        ]
+    elif isinstance(column.dtype, pd.ArrowDtype):
+        chunks = column.array._pa_array.chunks
+    else:
+        values = column.to_numpy()
+        return [(values.__array_interface__["data"][0], values.nbytes)]
+    found = []
+    for chunk in chunks:
+        if pa.types.is_dictionary(chunk.type):
+            found += [(b.address, b.size) for b in chunk.dictionary.buffers() if b]
+        found += [(b.address, b.size) for b in chunk.buffers() if b]
+    return found
+
+
+def copied_bytes(source, target):
+    """Bytes of ``target``'s buffers that do not lie inside ``source``'s."""
+    shared = buffers(source)
+    return sum(
+        size
+        for address, size in buffers(target)
+        if not any(start <= address < start + length for start, length in shared)
+    )
+
+
+def _column(frame, name):
+    # to_polars turns a named pandas index into a column
+    if isinstance(frame, pd.DataFrame) and name in frame.index.names:
+        return frame.index.get_level_values(name)
+    return frame[name]
+
+
+def _notify(conversion, source, target):
+    for hook in COPY_HOOKS:
+        hook(conversion, source, target)
+
+
+class CopyCounter:
+    """Records, per conversion and column, how many bytes were duplicated."""
+
+    def __init__(self):
+        self.records = []
+
+    def __call__(self, conversion, source, target):
+        for name in target.columns:
+            total = sum(size for _, size in buffers(target[name]))
+            self.records.append(
+                {
+                    "conversion": conversion,
+                    "column": name,
+                    "bytes": total,
+                    "copied_bytes": copied_bytes(_column(source, name), target[name]),
+                }
+            )
+
+    @property
+    def copied(self):
+        return sum(record["copied_bytes"] for record in self.records)
+
+    def report(self):
+        return pl.DataFrame(
+            self.records,
+            schema={
+                "conversion": pl.String,
+                "column": pl.String,
+                "bytes": pl.Int64,
+                "copied_bytes": pl.Int64,
+            },
+        )
+
+
+@contextlib.contextmanager
+def count_copies():
+    """Count the bytes copied by every conversion inside the ``with`` block."""
+    counter = CopyCounter()
+    COPY_HOOKS.append(counter)
+    try:
+        yield counter
+    finally:
+        COPY_HOOKS.remove(counter)
@@ -0,0 +1,444 @@
+"""Time the pandas recipes of the cookbook against their polars rewrites.
+
+Every operation that the chapters pair up (read_csv, value_counts, boolean
+filtering, groupby/aggregate, resample, str.contains, to_datetime) is run on
+the files in ``data/`` and on synthetic scale-ups of them. Each measurement
+runs in a fresh worker process, so the peak RSS reported for one operation is
+not inflated by the ones that ran before it, and RSS is sampled while the
+operation runs so that loading the input does not hide its peak.
+
+Run it from the cookbook folder, like the chapters:
+
+    python benchmark.py --scales 1 10 100 1000 --output benchmark.csv
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+import pandas as pd
+import polars as pl
+
+import generate_311
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+# file name, number of header lines and number of trailer lines of each input
+Dataset = namedtuple("Dataset", ["file_name", "header_lines", "trailer_lines"])
+
+DATASETS = {
+    "bikes": Dataset("bikes.csv", 1, 0),
+    "complaints": Dataset("311-service-requests.csv", 1, 0),
+    "weather": Dataset("weather_2012.csv", 1, 0),
+    "popcon": Dataset("popularity-contest", 1, 1),
+}
+
+POPCON_COLUMNS = ["atime", "ctime", "package-name", "mru-program", "tag"]
+
+
+# Loaders. These are not timed (except for the read_csv operation itself),
+# they just get the input of an operation into memory.
+
+
+def pd_read_bikes(path):
+    return pd.read_csv(
+        path,
+        sep=";",
+        encoding="latin1",
+        parse_dates=["Date"],
+        dayfirst=True,
+        index_col="Date",
+    )
+
+
+def pl_read_bikes(path):
+    # the file is latin1; polars only reads UTF-8, so decode it like pandas does
+    text = Path(path).read_bytes().decode("latin1").encode()
+    return pl.read_csv(text, separator=";").with_columns(
+        pl.col("Date").str.to_date("%d/%m/%Y")
+    )
+
+
+def pd_read_complaints(path):
+    return pd.read_csv(path, dtype="unicode")
+
+
+def pl_read_complaints(path):
+    return pl.read_csv(path, infer_schema=False)
+
+
+def pd_read_weather(path):
+    return pd.read_csv(path, parse_dates=True, index_col="date_time")
+
+
+def pl_read_weather(path):
+    return pl.read_csv(path, try_parse_dates=True)
+
+
+def pd_read_popcon(path):
+    popcon = pd.read_csv(path, sep=" ")[:-1]
+    popcon.columns = POPCON_COLUMNS
+    popcon["atime"] = popcon["atime"].astype(int)
+    popcon["ctime"] = popcon["ctime"].astype(int)
+    return popcon
+
+
+def pl_read_popcon(path):
+    popcon = pl.read_csv(
+        path,
+        separator=" ",
+        has_header=False,
+        skip_rows=1,
+        schema={column: pl.String for column in POPCON_COLUMNS},
+        truncate_ragged_lines=True,
+    )[:-1]
+    return popcon.with_columns(pl.col("atime", "ctime").cast(pl.Int64))
+
+
+# The operations themselves, one pandas and one polars version each.
+
+
+def pd_value_counts(complaints):
+    return complaints["Complaint Type"].value_counts()[:10]
+
+
+def pl_value_counts(complaints):
+    return complaints["Complaint Type"].value_counts(sort=True)[:10]
+
+
+def pd_boolean_filter(complaints):
+    is_noise = complaints["Complaint Type"] == "Noise - Street/Sidewalk"
+    in_brooklyn = complaints["Borough"] == "BROOKLYN"
+    return complaints[is_noise & in_brooklyn]
+
+
+def pl_boolean_filter(complaints):
+    return complaints.filter(
+        (pl.col("Complaint Type") == "Noise - Street/Sidewalk")
+        & (pl.col("Borough") == "BROOKLYN")
+    )
+
+
+def pd_groupby_aggregate(bikes):
+    berri_bikes = bikes[["Berri 1"]].copy()
+    berri_bikes.loc[:, "weekday"] = berri_bikes.index.weekday
+    return berri_bikes.groupby("weekday").aggregate("sum")
+
+
+def pl_groupby_aggregate(bikes):
+    return bikes.group_by(pl.col("Date").dt.weekday().alias("weekday")).agg(
+        pl.col("Berri 1").sum()
+    )
+
+
+def pd_resample(weather):
+    return weather["temperature_c"].resample("M").median()
+
+
+def pl_resample(weather):
+    return (
+        weather.sort("date_time")
+        .group_by_dynamic("date_time", every="1mo")
+        .agg(pl.col("temperature_c").median())
+    )
+
+
+def pd_str_contains(weather):
+    return weather["weather"].str.contains("Snow")
+
+
+def pl_str_contains(weather):
+    return weather["weather"].str.contains("Snow", literal=True)
+
+
+def pd_to_datetime(popcon):
+    return popcon.assign(
+        atime=pd.to_datetime(popcon["atime"], unit="s"),
+        ctime=pd.to_datetime(popcon["ctime"], unit="s"),
+    )
+
+
+def pl_to_datetime(popcon):
+    return popcon.with_columns(
+        pl.from_epoch("atime", time_unit="s"), pl.from_epoch("ctime", time_unit="s")
+    )
+
+
+def _identity(path):
+    return path
+
+
+# chapter, dataset, {library: loader}, {library: operation}
+Operation = namedtuple("Operation", ["chapter", "dataset", "load", "run"])
+
+OPERATIONS = {
+    "read_csv": Operation(
+        1,
+        "bikes",
+        {"pandas": _identity, "polars": _identity},
+        {"pandas": pd_read_bikes, "polars": pl_read_bikes},
+    ),
+    "value_counts": Operation(
+        2,
+        "complaints",
+        {"pandas": pd_read_complaints, "polars": pl_read_complaints},
+        {"pandas": pd_value_counts, "polars": pl_value_counts},
+    ),
+    "boolean_filter": Operation(
+        3,
+        "complaints",
+        {"pandas": pd_read_complaints, "polars": pl_read_complaints},
+        {"pandas": pd_boolean_filter, "polars": pl_boolean_filter},
+    ),
+    "groupby_aggregate": Operation(
+        4,
+        "bikes",
+        {"pandas": pd_read_bikes, "polars": pl_read_bikes},
+        {"pandas": pd_groupby_aggregate, "polars": pl_groupby_aggregate},
+    ),
+    "resample": Operation(
+        6,
+        "weather",
+        {"pandas": pd_read_weather, "polars": pl_read_weather},
+        {"pandas": pd_resample, "polars": pl_resample},
+    ),
+    "str_contains": Operation(
+        6,
+        "weather",
+        {"pandas": pd_read_weather, "polars": pl_read_weather},
+        {"pandas": pd_str_contains, "polars": pl_str_contains},
+    ),
+    "to_datetime": Operation(
+        8,
+        "popcon",
+        {"pandas": pd_read_popcon, "polars": pl_read_popcon},
+        {"pandas": pd_to_datetime, "polars": pl_to_datetime},
+    ),
+}
+
+LIBRARIES = ["pandas", "polars"]
+
+
+# Synthetic scale-ups and measurement.
+
+
+def scale_dataset(name, factor, directory):
+    """Write ``factor`` copies of the rows of a dataset to ``directory``.
+
+    The header and trailer lines are kept once, so the scaled file parses
+    exactly like the original. Returns the path and the number of data rows.
+    The 311 file is not part of the repository, so it is generated first if
+    it is missing.
+    """
+    dataset = DATASETS[name]
+    source = DATA_DIR / dataset.file_name
+    if name == "complaints" and not source.exists():
+        generate_311.generate(source)
+    lines = source.read_bytes().splitlines(keepends=True)
+    header = lines[: dataset.header_lines]
+    trailer = lines[len(lines) - dataset.trailer_lines :]
+    body = lines[dataset.header_lines : len(lines) - dataset.trailer_lines]
+    if factor == 1:
+        return source, len(body)
+
+    target = Path(directory) / f"{source.stem}_x{factor}{source.suffix}"
+    if not target.exists():
+        chunk = b"".join(body)
+        with open(target, "wb") as f:
+            f.writelines(header)
+            for _ in range(factor):
+                f.write(chunk)
+            f.writelines(trailer)
+    return target, len(body) * factor
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak / 1024**2
+    return peak / 1024
+
+
+def current_rss_mb():
+    """Current resident set size of this process in MB, or None if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+
+
+class RssSampler:
+    """Track the highest RSS seen while the ``with`` block runs.
+
+    The peak RSS of the process is usually set by loading the input, so it
+    says little about the operation itself. Where ``/proc`` is available the
+    RSS is polled in a background thread instead; elsewhere this falls back
+    to the growth of the peak RSS.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self._baseline = current_rss_mb()
+        self._peak_before = peak_rss_mb()
+        if self._baseline is not None:
+            self._highest = self._baseline
+            self._thread = threading.Thread(target=self._poll, daemon=True)
+            self._thread.start()
+        return self
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            self._highest = max(self._highest, current_rss_mb())
+
+    def __exit__(self, *exc):
+        if self._baseline is None:
+            self.peak_mb = peak_rss_mb() - self._peak_before
+            return
+        self._stop.set()
+        self._thread.join()
+        self._highest = max(self._highest, current_rss_mb())
+        self.peak_mb = self._highest - self._baseline
+
+
+def _measure(operation_name, library, path, repeat):
+    operation = OPERATIONS[operation_name]
+    data = operation.load[library](path)
+    run = operation.run[library]
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run(data)
+        best = min(best, time.perf_counter() - start)
+        del result
+    # the sampler thread competes for the GIL, so memory gets a pass of its own
+    with RssSampler() as rss:
+        result = run(data)
+        del result
+    return best, rss.peak_mb
+
+
+def measure(operation_name, library, path, repeat=3):
+    """Time one operation in a fresh process.
+
+    Returns the best wall time over ``repeat`` runs in seconds and the peak
+    RSS growth in MB caused by the operation, on top of its loaded input,
+    measured in one more run that is not timed.
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_measure, (operation_name, library, str(path), repeat))
+
+
+def run_benchmarks(operations=None, scales=(1, 10, 100), repeat=3, scratch=None):
+    """Run every operation for both libraries at each scale.
+
+    Returns a list of dicts, one per (operation, library, scale). A failing
+    operation is reported in the ``error`` field instead of stopping the run.
+    """
+    operations = operations or list(OPERATIONS)
+    cleanup = scratch is None
+    scratch = Path(scratch or tempfile.mkdtemp(prefix="cookbook-benchmark-"))
+    scratch.mkdir(parents=True, exist_ok=True)
+    results = []
+    try:
+        for scale in scales:
+            for operation_name in operations:
+                operation = OPERATIONS[operation_name]
+                path, rows = scale_dataset(operation.dataset, scale, scratch)
+                for library in LIBRARIES:
+                    result = {
+                        "operation": operation_name,
+                        "chapter": operation.chapter,
+                        "library": library,
+                        "scale": scale,
+                        "rows": rows,
+                        "wall_time_s": None,
+                        "peak_rss_mb": None,
+                        "rows_per_s": None,
+                        "error": None,
+                    }
+                    try:
+                        seconds, rss = measure(operation_name, library, path, repeat)
+                    except Exception as e:
+                        result["error"] = f"{type(e).__name__}: {e}"
+                    else:
+                        result["wall_time_s"] = seconds
+                        result["peak_rss_mb"] = rss
+                        result["rows_per_s"] = rows / seconds if seconds else None
+                    results.append(result)
+                    print(format_result(result), flush=True)
+    finally:
+        if cleanup:
+            shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def format_result(result):
+    name = f"ch{result['chapter']} {result['operation']:<18} {result['library']:<7}"
+    name += f" x{result['scale']:<5}"
+    if result["error"]:
+        return f"{name} FAILED {result['error']}"
+    return (
+        f"{name} {result['wall_time_s'] * 1000:10.2f} ms"
+        f" {result['peak_rss_mb']:9.1f} MB"
+        f" {result['rows_per_s']:14,.0f} rows/s"
+    )
+
+
+def write_results(results, path):
+    """Write results as JSON or CSV, depending on the file extension."""
+    path = Path(path)
+    if path.suffix == ".json":
+        path.write_text(json.dumps(results, indent=2))
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--operations", nargs="+", choices=list(OPERATIONS), default=None
+    )
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--scratch", help="where to keep the scaled files (default: a temp dir)"
+    )
+    parser.add_argument("--output", help="write the results to a .csv or .json file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.operations, args.scales, args.repeat, args.scratch)
+    if args.output:
+        write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
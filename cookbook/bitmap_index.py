@@ -0,0 +1,186 @@
+"""Bitmap indexes for slicing the 311 data by low-cardinality columns.
+
+Chapter 3 builds masks such as
+
+    is_noise = complaints["Complaint Type"] == "Noise - Street/Sidewalk"
+    in_brooklyn = complaints["Borough"] == "BROOKLYN"
+    complaints[is_noise & in_brooklyn]
+
+and every comparison scans a whole string column. ``BitmapIndex`` scans each
+indexed column once and keeps, for each of its values, a packed bitset of
+the rows holding it (one bit per row). Predicates then only combine
+bitsets, eight rows per byte, and the matching rows are gathered:
+
+    index = BitmapIndex(load_complaints(), ["Complaint Type", "Borough"])
+    noise = index.eq("Complaint Type", "Noise - Street/Sidewalk")
+    index.filter(noise & index.eq("Borough", "BROOKLYN"))
+    index.count(noise & ~index.isin("Borough", ["BROOKLYN", "QUEENS"]))
+
+The combined bitsets of the last ``cache_size`` predicates used are kept,
+least recently used first out, so repeating or extending a slice does not
+recompute its parts.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import polars as pl
+
+# number of set bits of every byte value
+_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+class Mask:
+    """A predicate over a ``BitmapIndex``; combine with ``&``, ``|`` and ``~``."""
+
+    def __init__(self, index, key):
+        self.index = index
+        self.key = key
+
+    def _combine(self, op, other):
+        # a & b & c is one ("and", a, b, c) key, not nested pairs; operands
+        # are interned by the index, so keys stay flat however deep the
+        # predicate, and hashing or comparing them never recurses
+        operands = []
+        for key in (self.key, other.key):
+            operands.extend(key[1:] if key[0] == op else [self.index._intern(key)])
+        return Mask(self.index, (op, *operands))
+
+    def __and__(self, other):
+        return self._combine("and", other)
+
+    def __or__(self, other):
+        return self._combine("or", other)
+
+    def __invert__(self):
+        if self.key[0] == "not":
+            return Mask(self.index, self.index._keys[self.key[1]])
+        return Mask(self.index, ("not", self.index._intern(self.key)))
+
+    @property
+    def bits(self):
+        """The packed bitset of the rows matching this predicate."""
+        return self.index.evaluate(self.key)
+
+    def __repr__(self):
+        return f"Mask({self.key!r})"
+
+
+class BitmapIndex:
+    """Packed bitsets of the rows holding each value of ``columns``."""
+
+    def __init__(self, frame, columns, cache_size=256):
+        self.frame = frame
+        self.height = frame.height
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        # the operands of "and", "or" and "not" keys are ids into _keys
+        self._ids = {}
+        self._keys = []
+        self._bitmaps = {column: self._build(frame[column]) for column in columns}
+        self._empty = np.zeros((self.height + 7) // 8, dtype=np.uint8)
+
+    def _build(self, values):
+        # sort the row numbers by value once, so each value's rows are a slice
+        values = values.cast(pl.String)
+        order = values.arg_sort(nulls_last=True).to_numpy()
+        runs = values.gather(order).rle().struct.unnest()
+        bitmaps = {}
+        start = 0
+        for length, value in runs.iter_rows():
+            rows = order[start : start + length]
+            bits = np.zeros((self.height + 7) // 8, dtype=np.uint8)
+            np.bitwise_or.at(bits, rows >> 3, (0x80 >> (rows & 7)).astype(np.uint8))
+            bitmaps[value] = bits
+            start += length
+        return bitmaps
+
+    def _intern(self, key):
+        node = self._ids.get(key)
+        if node is None:
+            node = self._ids[key] = len(self._keys)
+            self._keys.append(key)
+        return node
+
+    def values(self, column):
+        """The distinct values of an indexed column."""
+        return list(self._bitmaps[column])
+
+    def eq(self, column, value):
+        """Rows where ``column == value`` (``None`` matches nulls)."""
+        return Mask(self, ("eq", column, value))
+
+    def isin(self, column, values):
+        """Rows where ``column`` is one of ``values``."""
+        return Mask(self, ("in", column, frozenset(values)))
+
+    def evaluate(self, key):
+        """Packed bitset of a predicate key, from the cache when possible."""
+        # operands are evaluated from an explicit stack rather than by
+        # recursion, as alternating & and | nest keys as deep as the chain
+        found = {}
+        stack = [key]
+        while stack:
+            top = stack[-1]
+            if top in found:
+                stack.pop()
+            elif top in self._cache:
+                self._cache.move_to_end(top)
+                found[top] = self._cache[top]
+                stack.pop()
+            else:
+                operands = self._operands(top)
+                missing = [operand for operand in operands if operand not in found]
+                if missing:
+                    stack.extend(missing)
+                    continue
+                stack.pop()
+                found[top] = self._store(
+                    top, self._compute(top, [found[k] for k in operands])
+                )
+        return found[key]
+
+    def _operands(self, key):
+        if key[0] in ("and", "or", "not"):
+            return [self._keys[node] for node in key[1:]]
+        return []
+
+    def _store(self, key, bits):
+        self._cache[key] = bits
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return bits
+
+    def _compute(self, key, operands):
+        op = key[0]
+        if op == "eq":
+            return self._bitmaps[key[1]].get(key[2], self._empty)
+        if op == "in":
+            bitmaps = self._bitmaps[key[1]]
+            return np.bitwise_or.reduce(
+                [bitmaps.get(value, self._empty) for value in key[2]] or [self._empty]
+            )
+        if op == "and":
+            return np.bitwise_and.reduce(operands)
+        if op == "or":
+            return np.bitwise_or.reduce(operands)
+        if op == "not":
+            bits = ~operands[0]
+            # clear the padding bits after the last row
+            padding = len(bits) * 8 - self.height
+            if padding:
+                bits[-1] &= np.uint8(0xFF << padding & 0xFF)
+            return bits
+        raise ValueError(f"unknown predicate {key!r}")
+
+    def rows(self, mask):
+        """Row numbers matching ``mask``."""
+        return np.flatnonzero(np.unpackbits(mask.bits, count=self.height))
+
+    def count(self, mask):
+        """Number of rows matching ``mask``, without materializing them."""
+        return int(_POPCOUNT[mask.bits].sum())
+
+    def filter(self, mask):
+        """The rows of the indexed frame matching ``mask``."""
+        return self.frame[self.rows(mask)]
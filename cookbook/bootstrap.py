@@ -0,0 +1,222 @@
+"""Lazy imports for the chapter scripts, and a startup-time check.
+
+The chapters start by importing pandas, matplotlib.pyplot, numpy and polars
+and styling the plots, which costs about a second before the first line of
+real work, even when a run never draws anything. Importing them from here
+instead defers each import until the module is first used:
+
+    from bootstrap import configure, np, pd, pl, plt
+
+    configure(rc={"figure.figsize": (15, 5)})
+
+``configure`` records the plot style, rcParams and pandas display options;
+they are applied when matplotlib or pandas is actually imported (or right
+away if it already is). That includes matplotlib being imported by pandas'
+``.plot()``, before the chapter ever touches ``plt``.
+
+Run this file to see where the startup time of a chapter goes. It runs the
+first cell of each chapter under ``python -X importtime``, prints the
+slowest imports and exits with status 1 if any chapter needs longer than
+the budget:
+
+    python bootstrap.py --budget-ms 500
+    python bootstrap.py "Chapter 6*" --top 20
+"""
+
+import argparse
+import importlib
+import importlib.abc
+import importlib.util
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+COOKBOOK_DIR = Path(__file__).resolve().parent
+
+# nothing is changed until a chapter asks for it with configure()
+_settings = {"style": None, "rc": {}, "pandas_options": {}}
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    ``setup`` is called with the module right after the import.
+    """
+
+    def __init__(self, name, setup=None):
+        self.__dict__.update(_name=name, _setup=setup, _module=None)
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = importlib.import_module(self._name)
+            self.__dict__["_module"] = module
+            if self._setup is not None:
+                self._setup(module)
+        return module
+
+    @property
+    def loaded(self):
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded yet"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+class _AfterImport(importlib.abc.MetaPathFinder):
+    """Calls ``callback`` with a module as soon as anything imports it."""
+
+    def __init__(self, name, callback):
+        self.name = name
+        self.callback = callback
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname != self.name:
+            return None
+        # one shot: look the module up without this finder, then wrap its loader
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(fullname)
+        if spec is None or spec.loader is None:
+            return spec
+        exec_module = spec.loader.exec_module
+
+        def exec_and_call_back(module):
+            exec_module(module)
+            self.callback(module)
+
+        spec.loader.exec_module = exec_and_call_back
+        return spec
+
+
+def _setup_matplotlib(matplotlib):
+    import matplotlib.style
+
+    if _settings["style"]:
+        matplotlib.style.use(_settings["style"])
+    matplotlib.rcParams.update(_settings["rc"])
+
+
+def _setup_pandas(pd):
+    for option, value in _settings["pandas_options"].items():
+        pd.set_option(option, value)
+
+
+def _when_imported(name, callback):
+    if name in sys.modules:
+        callback(sys.modules[name])
+    else:
+        sys.meta_path.insert(0, _AfterImport(name, callback))
+
+
+# the style is matplotlib's, not pyplot's: pandas plots import matplotlib
+# without going through the plt proxy
+_when_imported("matplotlib", _setup_matplotlib)
+
+pd = LazyModule("pandas", _setup_pandas)
+pl = LazyModule("polars")
+np = LazyModule("numpy")
+plt = LazyModule("matplotlib.pyplot")
+
+
+def configure(style=None, rc=None, pandas_options=None):
+    """Set the plot style, rcParams and pandas options of a chapter.
+
+    Nothing is imported here: the settings are applied once matplotlib or
+    pandas is loaded, or immediately if it already is.
+    """
+    _settings.update(
+        style=style, rc=dict(rc or {}), pandas_options=dict(pandas_options or {})
+    )
+    if "matplotlib" in sys.modules:
+        _setup_matplotlib(sys.modules["matplotlib"])
+    if pd.loaded:
+        _setup_pandas(pd._load())
+
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure_startup(code):
+    """Run ``code`` in a fresh interpreter under ``-X importtime``.
+
+    Returns the wall time of the whole process in seconds and one dict per
+    imported module with its own and cumulative import time in ms and its
+    nesting depth (0 for modules ``code`` imported directly).
+    """
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=COOKBOOK_DIR,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    if process.returncode:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+    imports = []
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            imports.append(
+                {
+                    "module": module,
+                    "self_ms": int(own) / 1000,
+                    "cumulative_ms": int(cumulative) / 1000,
+                    "depth": (len(indent) - 1) // 2,
+                }
+            )
+    return wall, imports
+
+
+def first_cell(path):
+    """The code of a script up to its second ``# %%`` marker."""
+    lines = Path(path).read_text(encoding="utf-8").splitlines(keepends=True)
+    markers = [i for i, line in enumerate(lines) if line.startswith("# %%")]
+    end = markers[1] if len(markers) > 1 else len(lines)
+    return "".join(lines[:end])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "chapters", nargs="*", help='glob patterns of scripts (default "Chapter *.py")'
+    )
+    parser.add_argument(
+        "--budget-ms", type=float, default=None, help="fail above this startup time"
+    )
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to show")
+    args = parser.parse_args(argv)
+
+    patterns = args.chapters or ["Chapter *.py"]
+    paths = sorted({p for pattern in patterns for p in COOKBOOK_DIR.glob(pattern)})
+    over_budget = []
+    for path in paths:
+        wall, imports = measure_startup(first_cell(path))
+        top_level = [i for i in imports if i["depth"] == 0]
+        imported_ms = sum(i["cumulative_ms"] for i in top_level)
+        print(f"{path.stem}: {wall * 1000:.0f} ms, {imported_ms:.0f} ms in imports")
+        for entry in sorted(top_level, key=lambda i: -i["cumulative_ms"])[: args.top]:
+            print(f"  {entry['cumulative_ms']:9.1f} ms  {entry['module']}")
+        if args.budget_ms is not None and wall * 1000 > args.budget_ms:
+            over_budget.append(path.stem)
+    if over_budget:
+        print(f"over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
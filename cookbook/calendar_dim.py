@@ -0,0 +1,142 @@
+"""A precomputed calendar table to look up date features by integer key.
+
+Chapter 4 takes ``berri_bikes.index.weekday``, chapter 5
+``weather_mar2012.index.hour`` and chapter 6 groups by month, each time
+taking every row's timestamp apart again. ``CALENDAR`` does that once, for
+every day from 1900 to 2100 (about 73,000 rows):
+
+    ┌────────────┬─────────┬──────────────┬───────┬──────────┬─────────────┬────────────┐
+    │ date       ┆ weekday ┆ weekday_name ┆ month ┆ iso_week ┆ day_of_year ┆ is_weekend │
+    ╞════════════╪═════════╪══════════════╪═══════╪══════════╪═════════════╪════════════╡
+    │ 2012-01-01 ┆ 6       ┆ Sunday       ┆ 1     ┆ 52       ┆ 1           ┆ true       │
+
+``weekday`` counts from 0 for Monday, like pandas. Since the table holds
+consecutive days, the row of a date is just its number of days since
+``CALENDAR_START``, so ``calendar_features`` looks features up with a gather
+on that integer, without a join or any string or date arithmetic per row:
+
+    from calendar_dim import calendar_features
+
+    bikes.with_columns(calendar_features("Date", "weekday_name"))
+
+``reindex_days`` puts a daily series with missing days (chapter 4's 310 of
+366) onto every day of its range, or of a given one such as the whole year.
+"""
+
+from datetime import date, datetime
+
+import polars as pl
+
+CALENDAR_START = date(1900, 1, 1)
+CALENDAR_END = date(2100, 12, 31)
+
+WEEKDAYS = pl.Enum(
+    ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+)
+
+
+def _build_calendar():
+    days = pl.date_range(CALENDAR_START, CALENDAR_END, "1d", eager=True).alias("date")
+    weekday = days.dt.weekday() - 1
+    return pl.DataFrame(
+        {
+            "date": days,
+            "weekday": weekday.cast(pl.Int8),
+            "weekday_name": pl.Series(WEEKDAYS.categories)
+            .gather(weekday)
+            .cast(WEEKDAYS),
+            "month": days.dt.month(),
+            "iso_week": days.dt.week(),
+            "day_of_year": days.dt.ordinal_day(),
+            "is_weekend": weekday >= 5,
+        }
+    )
+
+
+CALENDAR = _build_calendar()
+FEATURES = CALENDAR.columns[1:]
+
+_START_KEY = (CALENDAR_START - date(1970, 1, 1)).days
+
+
+def day_key(time_column):
+    """Row of ``CALENDAR`` holding the day of a Date or Datetime column.
+
+    Null for days outside the calendar, which a gather would otherwise wrap
+    around (before 1900) or fail on (after 2100).
+    """
+    key = pl.col(time_column).cast(pl.Date).cast(pl.Int32) - _START_KEY
+    return pl.when(key.is_between(0, CALENDAR.height - 1)).then(key)
+
+
+def calendar_features(time_column, *features):
+    """Expressions for calendar ``features`` of ``time_column``, looked up
+    in ``CALENDAR``. Without ``features``, all of them.
+
+    ``"hour"`` may be asked for too on Datetime columns; it is not in the
+    daily table but taken from the time since midnight. Days before
+    ``CALENDAR_START`` or after ``CALENDAR_END`` get null features.
+    """
+    key = day_key(time_column)
+    expressions = []
+    for feature in features or FEATURES:
+        if feature == "hour":
+            expressions.append(pl.col(time_column).dt.hour().alias("hour"))
+        else:
+            expressions.append(pl.lit(CALENDAR[feature]).gather(key).alias(feature))
+    return expressions
+
+
+def _as_date(day):
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    if isinstance(day, datetime):
+        day = day.date()
+    return day
+
+
+def reindex_days(frame, time_column="Date", fill=None, start=None, end=None):
+    """Put a daily ``frame`` onto every day from ``start`` to ``end``.
+
+    ``start`` and ``end`` (dates or ISO strings, both included) default to
+    the first and last day of ``frame``; rows outside them are dropped.
+    Days that were missing get nulls, or ``fill``: a value, or one of
+    polars' fill strategies such as "forward" or "zero". The calendar
+    features are not added; use ``calendar_features`` for that. Raises
+    ValueError if the days go beyond the calendar.
+    """
+    bounds = (
+        frame.lazy()
+        .select(
+            pl.col(time_column).cast(pl.Date).min().alias("first"),
+            pl.col(time_column).cast(pl.Date).max().alias("last"),
+        )
+        .collect()
+    )
+    first, last = bounds.row(0)
+    first = first if start is None else _as_date(start)
+    last = last if end is None else _as_date(end)
+    if first is None or last is None:
+        # no days at all (or only nulls), so there is nothing to fill in
+        return (
+            frame.lazy()
+            .filter(pl.col(time_column).is_not_null())
+            .with_columns(pl.col(time_column).cast(pl.Date))
+            .collect()
+        )
+    if first < CALENDAR_START or last > CALENDAR_END:
+        raise ValueError(
+            f"{first} to {last} is outside the calendar"
+            f" ({CALENDAR_START} to {CALENDAR_END})"
+        )
+    days = CALENDAR.slice(
+        (first - CALENDAR_START).days, max((last - first).days + 1, 0)
+    ).select(pl.col("date").alias(time_column))
+    frame = frame.lazy().with_columns(pl.col(time_column).cast(pl.Date))
+    full = days.lazy().join(frame, on=time_column, how="left", maintain_order="left")
+    values = pl.exclude(time_column)
+    if isinstance(fill, str):
+        full = full.with_columns(values.fill_null(strategy=fill))
+    elif fill is not None:
+        full = full.with_columns(values.fill_null(fill))
+    return full.collect()
@@ -0,0 +1,211 @@
+"""Cache the DataFrames computed by expensive chapter cells on disk.
+
+Re-running a chapter (or a single cell further down) parses and cleans the
+same inputs again every time. Decorating the function that does the work
+with ``memoize`` stores its result as an Arrow IPC file and memory-maps it
+back on the next call with the same key:
+
+    from cell_cache import memoize
+
+    @memoize
+    def load_requests(path):
+        return clean_zips(pl.read_csv(path, infer_schema=False))
+
+    pl_requests = load_requests("../data/311-service-requests.csv")
+
+The key is a SHA-256 over the source code of the function, its arguments
+(DataFrames and Series by their contents) and the contents of every input
+file, so editing the function or the data invalidates the cached result.
+Input files are the arguments that name an existing file, plus any passed
+as ``inputs=``. File hashes are remembered by size and modification time,
+so unchanged inputs are not re-read.
+
+The cache lives in ``data/.cache/cells`` and is capped at ``max_bytes``;
+when it grows past the cap, the least recently used results are evicted.
+"""
+
+import functools
+import hashlib
+import inspect
+import io
+import json
+import os
+import types
+from pathlib import Path
+
+import polars as pl
+
+from nyc311 import file_hash
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+CACHE_DIR = DATA_DIR / ".cache" / "cells"
+MAX_BYTES = 2 << 30
+
+
+def _code_fingerprint(code):
+    """Bytecode and constants of a code object, without memory addresses."""
+    parts = [code.co_code.hex()]
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            parts.append(_code_fingerprint(const))
+        else:
+            parts.append(repr(const))
+    return "\n".join(parts)
+
+
+def _value_fingerprint(value):
+    """A string that changes whenever an argument's contents change.
+
+    The repr of a DataFrame or Series only shows its first and last rows, so
+    frames are hashed through their Arrow IPC bytes instead.
+    """
+    if isinstance(value, (pl.DataFrame, pl.Series)):
+        frame = value.to_frame() if isinstance(value, pl.Series) else value
+        buffer = io.BytesIO()
+        frame.write_ipc(buffer, compression="uncompressed")
+        return f"{type(value).__name__}:{hashlib.sha256(buffer.getvalue()).hexdigest()}"
+    if type(value).__name__ in ("DataFrame", "Series") and type(
+        value
+    ).__module__.startswith("pandas"):
+        import pandas as pd
+
+        if isinstance(value, pd.Series):
+            value = value.to_frame()
+        rows = pd.util.hash_pandas_object(value, index=True).to_numpy()
+        header = repr([list(value.columns), [str(t) for t in value.dtypes]])
+        return f"pandas:{header}:{hashlib.sha256(rows.tobytes()).hexdigest()}"
+    if isinstance(value, (list, tuple)):
+        items = ", ".join(_value_fingerprint(item) for item in value)
+        return f"{type(value).__name__}({items})"
+    if isinstance(value, dict):
+        items = ", ".join(
+            f"{_value_fingerprint(k)}: {_value_fingerprint(v)}"
+            for k, v in value.items()
+        )
+        return f"dict({items})"
+    return repr(value)
+
+
+class CellCache:
+    """A directory of Arrow IPC results, evicted least recently used first."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._hashes_path = self.cache_dir / "file_hashes.json"
+        self._hashes = None
+
+    def file_fingerprint(self, path):
+        """SHA-256 of a file, only recomputed when its size or mtime change."""
+        path = Path(path).resolve()
+        if self._hashes is None:
+            self._hashes = (
+                json.loads(self._hashes_path.read_text())
+                if self._hashes_path.exists()
+                else {}
+            )
+        stat = path.stat()
+        entry = self._hashes.get(str(path))
+        if (
+            entry
+            and entry["size"] == stat.st_size
+            and entry["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return entry["sha256"]
+        sha256 = file_hash(path)
+        self._hashes[str(path)] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+        }
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._hashes_path.write_text(json.dumps(self._hashes, indent=2))
+        return sha256
+
+    def key(self, func, args, kwargs, inputs=()):
+        """Cache key of calling ``func(*args, **kwargs)`` on ``inputs``."""
+        try:
+            source = inspect.getsource(func)
+        except (OSError, TypeError):
+            source = _code_fingerprint(func.__code__)
+        digest = hashlib.sha256()
+        digest.update(f"{func.__module__}.{func.__qualname__}\n{source}".encode())
+        for value in [*args, *sorted(kwargs.items())]:
+            digest.update(_value_fingerprint(value).encode())
+        paths = [
+            value
+            for value in [*args, *kwargs.values()]
+            if isinstance(value, (str, Path)) and os.path.isfile(value)
+        ]
+        for path in [*paths, *inputs]:
+            digest.update(self.file_fingerprint(path).encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return self.cache_dir / f"{key}.arrow"
+
+    def get(self, key):
+        """The cached DataFrame of ``key``, or None."""
+        path = self.path(key)
+        if not path.exists():
+            return None
+        # the modification time doubles as the last-use time for eviction
+        os.utime(path)
+        return pl.read_ipc(path, memory_map=True)
+
+    def put(self, key, frame):
+        if isinstance(frame, pl.LazyFrame):
+            frame = frame.collect()
+        if not isinstance(frame, pl.DataFrame):
+            raise TypeError(
+                f"only polars DataFrames can be cached, not {type(frame).__name__}"
+            )
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".partial")
+        frame.write_ipc(partial, compression="uncompressed")
+        partial.replace(path)
+        self.evict()
+        return frame
+
+    def evict(self):
+        """Delete the least recently used results until the cache fits ``max_bytes``."""
+        entries = sorted(
+            (p.stat().st_mtime_ns, p.stat().st_size, p)
+            for p in self.cache_dir.glob("*.arrow")
+        )
+        total = sum(size for _, size, _ in entries)
+        # the newest result is kept even if it is bigger than the cap on its own
+        for _, size, path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        for path in self.cache_dir.glob("*.arrow"):
+            path.unlink()
+
+
+default_cache = CellCache()
+
+
+def memoize(func=None, *, inputs=(), cache=None):
+    """Decorator that caches the DataFrame returned by ``func`` on disk.
+
+    ``inputs`` lists extra files the result depends on that are not passed
+    as arguments, such as a file read at a fixed path.
+    """
+    if func is None:
+        return functools.partial(memoize, inputs=inputs, cache=cache)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        store = cache or default_cache
+        key = store.key(func, args, kwargs, inputs)
+        cached = store.get(key)
+        if cached is not None:
+            return cached
+        return store.put(key, func(*args, **kwargs))
+
+    return wrapper
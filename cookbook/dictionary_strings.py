@@ -0,0 +1,69 @@
+"""String predicates on dictionary-encoded columns.
+
+Chapter 6 runs ``weather_2012["weather"].str.contains("Snow")`` over every
+hourly row, although the column only has about fifty distinct values. If the
+column is stored dictionary-encoded (as a polars ``Enum``), a predicate only
+has to be evaluated once per distinct value; the answer for each row is then
+gathered through the integer codes:
+
+    weather_2012 = encode(pl.read_csv("../data/weather_2012.csv"), "weather")
+    is_snowing = weather_2012.select(contains(weather_2012, "weather", "Snow"))
+
+The functions return expressions, so they work in ``select``, ``filter`` and
+``with_columns`` on DataFrames and LazyFrames alike. On a column that is not
+an ``Enum`` they fall back to the ordinary ``str`` expression.
+"""
+
+import polars as pl
+
+
+def encode(frame, *columns):
+    """Dictionary-encode ``columns`` as ``Enum``s of their distinct values."""
+    categories = (
+        frame.lazy()
+        .select(pl.col(c).unique().drop_nulls().sort().implode() for c in columns)
+        .collect()
+    )
+    return frame.with_columns(
+        pl.col(c).cast(pl.Enum(categories[c][0])) for c in columns
+    )
+
+
+def _dtype(frame, column):
+    if isinstance(frame, pl.LazyFrame):
+        return frame.collect_schema()[column]
+    return frame.schema[column]
+
+
+def map_categories(frame, column, predicate):
+    """Evaluate ``predicate`` once per category of ``column`` and broadcast it.
+
+    ``predicate`` takes a String expression and returns an expression of the
+    same length, e.g. ``lambda s: s.str.contains("Snow")``.
+    """
+    dtype = _dtype(frame, column)
+    if not isinstance(dtype, pl.Enum):
+        return predicate(pl.col(column)).alias(column)
+    lookup = (
+        pl.DataFrame({column: dtype.categories})
+        .select(predicate(pl.col(column)))
+        .to_series()
+    )
+    return pl.lit(lookup).gather(pl.col(column).to_physical()).alias(column)
+
+
+def contains(frame, column, pattern, literal=False):
+    """``str.contains`` on ``column``, evaluated once per distinct value."""
+    return map_categories(
+        frame, column, lambda s: s.str.contains(pattern, literal=literal)
+    )
+
+
+def starts_with(frame, column, prefix):
+    """``str.starts_with`` on ``column``, evaluated once per distinct value."""
+    return map_categories(frame, column, lambda s: s.str.starts_with(prefix))
+
+
+def ends_with(frame, column, suffix):
+    """``str.ends_with`` on ``column``, evaluated once per distinct value."""
+    return map_categories(frame, column, lambda s: s.str.ends_with(suffix))
@@ -0,0 +1,109 @@
+"""Downsample time series to the width of the plot before drawing them.
+
+The chapters plot every row, e.g. ``weather_2012_final["temperature_c"].plot()``
+draws all 8,784 hours of 2012, although the axes are only about a thousand
+pixels wide. ``plot`` reduces each series to a few points per pixel column
+first, so drawing time depends on the width of the figure rather than on the
+number of rows:
+
+    from downsample import plot
+
+    weather_2012 = pl.read_csv("../data/weather_2012.csv", try_parse_dates=True)
+    plot(weather_2012, "date_time", "temperature_c")
+
+Two reductions are available:
+
+* ``"lttb"`` (Largest-Triangle-Three-Buckets, Steinarsson 2013) keeps, per
+  bucket of rows, the point that forms the largest triangle with its
+  neighbours, which keeps the shape of the line;
+* ``"minmax"`` keeps the lowest and highest point of each bucket, so every
+  peak and trough survives exactly.
+"""
+
+import matplotlib.pyplot as plt
+import numpy as np
+import polars as pl
+
+
+def _buckets(n, n_buckets):
+    return pl.int_range(pl.len()) * n_buckets // n
+
+
+def minmax_indices(y, n_out):
+    """Row indices of the minimum and maximum of ``n_out // 2`` equal buckets."""
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    frame = pl.DataFrame({"y": y}).with_row_index("i")
+    picked = (
+        frame.group_by(_buckets(n, max(n_out // 2, 1)).alias("bucket"))
+        .agg(
+            pl.col("i").get(pl.col("y").arg_min()).alias("low"),
+            pl.col("i").get(pl.col("y").arg_max()).alias("high"),
+        )
+        .select(pl.concat_list("low", "high").explode().unique().sort())
+    )
+    return picked.to_series().to_numpy()
+
+
+def lttb_indices(x, y, n_out):
+    """Row indices chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last rows are always kept; the rows in between are split
+    into ``n_out - 2`` buckets and one row is picked from each.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        start, stop = edges[b], edges[b + 1]
+        # the next bucket is represented by its average point
+        next_stop = edges[b + 2] if b + 2 < len(edges) else n
+        cx = x[stop:next_stop].mean()
+        cy = y[stop:next_stop].mean()
+        area = np.abs(
+            (x[a] - cx) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (cy - y[a])
+        )
+        a = start + int(area.argmax())
+        picked[b + 1] = a
+    return picked
+
+
+def downsample(frame, x, y, n_out, method="lttb"):
+    """The rows of ``frame`` that ``method`` keeps to draw ``y`` against ``x``
+    with ``n_out`` points. Rows where ``y`` is null are dropped first."""
+    frame = frame.select(x, y).drop_nulls(y)
+    values = frame[y].cast(pl.Float64).to_numpy()
+    if method == "lttb":
+        positions = frame[x].to_physical().cast(pl.Float64).to_numpy()
+        indices = lttb_indices(positions, values, n_out)
+    elif method == "minmax":
+        indices = minmax_indices(values, n_out)
+    else:
+        raise ValueError(f"method must be 'lttb' or 'minmax', not {method!r}")
+    return frame[indices]
+
+
+def plot(frame, x, y, ax=None, method="lttb", points_per_pixel=2, **kwargs):
+    """Line-plot one or more ``y`` columns of a polars frame against ``x``.
+
+    Each series is downsampled to ``points_per_pixel`` points per pixel of
+    the width of ``ax`` (a new figure's axes by default). Extra keyword
+    arguments go to ``ax.plot``. Returns the axes.
+    """
+    if ax is None:
+        _, ax = plt.subplots()
+    frame = frame.lazy().collect() if isinstance(frame, pl.LazyFrame) else frame
+    n_out = max(int(ax.get_window_extent().width * points_per_pixel), 3)
+    for column in [y] if isinstance(y, str) else y:
+        points = downsample(frame, x, column, n_out, method)
+        ax.plot(points[x].to_numpy(), points[column].to_numpy(), label=column, **kwargs)
+    if not isinstance(y, str):
+        ax.legend()
+    return ax
@@ -0,0 +1,374 @@
+"""Generate a synthetic NYC 311 service-request file.
+
+Chapters 2, 3 and 7 read ``../data/311-service-requests.csv``, which is too
+big to ship with the repository. This script writes a file with the same
+columns and the same kind of mess in it (zip codes like ``29616-0759``,
+``N/A``, ``NO CLUE`` and ``00000``, city names in mixed case, ...), at any
+number of rows. Rows are generated and written in chunks, so memory use does
+not depend on the size of the file.
+
+    python generate_311.py --rows 111069
+    python generate_311.py --rows 50000000 --output /scratch/311-big.csv
+
+The output only depends on ``rows``, ``seed`` and ``chunk_size``.
+"""
+
+import argparse
+import datetime as dt
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+DEFAULT_PATH = DATA_DIR / "311-service-requests.csv"
+
+# Number of rows in the original cookbook file
+DEFAULT_ROWS = 111069
+
+COLUMNS = [
+    "Unique Key",
+    "Created Date",
+    "Closed Date",
+    "Agency",
+    "Agency Name",
+    "Complaint Type",
+    "Descriptor",
+    "Location Type",
+    "Incident Zip",
+    "Incident Address",
+    "Street Name",
+    "Cross Street 1",
+    "Cross Street 2",
+    "Intersection Street 1",
+    "Intersection Street 2",
+    "Address Type",
+    "City",
+    "Landmark",
+    "Facility Type",
+    "Status",
+    "Due Date",
+    "Resolution Action Updated Date",
+    "Community Board",
+    "Borough",
+    "X Coordinate (State Plane)",
+    "Y Coordinate (State Plane)",
+    "Park Facility Name",
+    "Park Borough",
+    "School Name",
+    "School Number",
+    "School Region",
+    "School Code",
+    "School Phone Number",
+    "School Address",
+    "School City",
+    "School State",
+    "School Zip",
+    "School Not Found",
+    "School or Citywide Complaint",
+    "Vehicle Type",
+    "Taxi Company Borough",
+    "Taxi Pick Up Location",
+    "Bridge Highway Name",
+    "Bridge Highway Direction",
+    "Road Ramp",
+    "Bridge Highway Segment",
+    "Garage Lot Name",
+    "Ferry Direction",
+    "Ferry Terminal Name",
+    "Latitude",
+    "Longitude",
+    "Location",
+]
+
+# complaint type: (agency, relative frequency, descriptors)
+COMPLAINT_TYPES = {
+    "HEATING": ("HPD", 14200, ["HEAT", "STEAM"]),
+    "GENERAL CONSTRUCTION": ("HPD", 7471, ["PLASTER", "CEILING", "MOLD", "WINDOWS"]),
+    "Street Light Condition": ("DOT", 7117, ["Street Light Out", "Lamppost Damaged"]),
+    "DOF Literature Request": ("DOF", 5797, ["Property Tax Exemptions", "Forms"]),
+    "PLUMBING": ("HPD", 5373, ["WATER-SUPPLY", "TOILET", "BASIN/SINK"]),
+    "PAINT - PLASTER": ("HPD", 5149, ["WALLS", "CEILING"]),
+    "Blocked Driveway": ("NYPD", 4590, ["No Access", "Partial Access"]),
+    "NONCONST": ("HPD", 3998, ["VERMIN", "PESTS", "JANITOR/SUPER"]),
+    "Street Condition": ("DOT", 3473, ["Pothole", "Cave-in", "Failed Street Repair"]),
+    "Illegal Parking": (
+        "NYPD",
+        3343,
+        ["Double Parked Blocking Traffic", "Posted Parking Sign Violation"],
+    ),
+    "Noise": (
+        "DEP",
+        3321,
+        ["Noise: Construction Before/After Hours (NM1)", "Noise, Barking Dog (NR5)"],
+    ),
+    "Traffic Signal Condition": ("DOT", 3145, ["Controller", "LED Lense"]),
+    "Dirty Conditions": (
+        "DSNY",
+        2653,
+        ["E3 Dirty Sidewalk", "E11 Litter Surveillance"],
+    ),
+    "Water System": ("DEP", 2636, ["Hydrant Running (WC3)", "No Water (WNW)"]),
+    "Noise - Commercial": ("NYPD", 2578, ["Loud Music/Party", "Loud Talking"]),
+    "ELECTRIC": ("HPD", 2350, ["POWER", "WIRING", "OUTLET/SWITCH"]),
+    "Broken Muni Meter": ("DOT", 2070, ["No Receipt", "Coin or Card Did Not Register"]),
+    "Noise - Street/Sidewalk": ("NYPD", 1928, ["Loud Music/Party", "Loud Talking"]),
+    "Sanitation Condition": ("DSNY", 1824, ["15 Street Cond/Dump-Out/Drop-Off"]),
+    "Rodent": ("DOHMH", 1632, ["Rat Sighting", "Mouse Sighting"]),
+    "Sewer": ("DEP", 1627, ["Catch Basin Clogged/Flooding (Use Comments) (SC)"]),
+    "Taxi Complaint": (
+        "TLC",
+        1227,
+        ["Driver Complaint", "Insurance Information Requested"],
+    ),
+    "Consumer Complaint": ("DCA", 1227, ["Overcharge", "Receipt Incomplete/Not Given"]),
+    "Damaged or Dead Tree": ("DPR", 1208, ["Branch or Limb Has Fallen Down"]),
+}
+
+AGENCY_NAMES = {
+    "HPD": "Department of Housing Preservation and Development",
+    "DOT": "Department of Transportation",
+    "DOF": "Department of Finance",
+    "NYPD": "New York City Police Department",
+    "DEP": "Department of Environmental Protection",
+    "DSNY": "Department of Sanitation",
+    "DOHMH": "Department of Health and Mental Hygiene",
+    "TLC": "Taxi and Limousine Commission",
+    "DCA": "Department of Consumer Affairs",
+    "DPR": "Department of Parks and Recreation",
+}
+
+# borough: (relative frequency, zip codes, (latitude, longitude), city names)
+BOROUGHS = {
+    "BROOKLYN": (
+        32890,
+        ["11201", "11207", "11209", "11215", "11226", "11234"],
+        (40.65, -73.95),
+        ["BROOKLYN", "Brooklyn"],
+    ),
+    "QUEENS": (
+        22281,
+        ["11101", "11354", "11368", "11375", "11385", "11434"],
+        (40.73, -73.82),
+        ["JAMAICA", "ASTORIA", "Flushing", "QUEENS VILLAGE"],
+    ),
+    "MANHATTAN": (
+        24288,
+        ["10002", "10009", "10025", "10027", "10031", "10033"],
+        (40.78, -73.97),
+        ["NEW YORK", "New York"],
+    ),
+    "BRONX": (
+        19686,
+        ["10451", "10453", "10456", "10458", "10467", "10468"],
+        (40.84, -73.88),
+        ["BRONX", "Bronx"],
+    ),
+    "STATEN ISLAND": (
+        4766,
+        ["10301", "10304", "10306", "10312", "10314"],
+        (40.58, -74.15),
+        ["STATEN ISLAND"],
+    ),
+    "Unspecified": (7107, ["10000", "11000"], (40.71, -73.93), ["NEW YORK"]),
+}
+
+# How often a complaint type gets reported in Manhattan compared to elsewhere,
+# so that the noise-by-borough question of chapter 3 has a clear answer.
+MANHATTAN_BIAS = {"Noise - Street/Sidewalk": 3.0, "Noise - Commercial": 2.0}
+
+# Real but far-away zip codes and the city that goes with them
+FAR_ZIPS = {
+    "77056": "HOUSTON",
+    "90010": "LOS ANGELES",
+    "92123": "SAN DIEGO",
+    "94524": "CONCORD",
+    "29616": "GREENVILLE",
+    "35209": "BIRMINGHAM",
+    "41042": "FLORENCE",
+    "55164": "ST. PAUL",
+    "70711": "ALBANY",
+    "97838": "HERMISTON",
+    "02061": "NORWELL",
+    "07311": "JERSEY CITY",
+}
+
+# Zip codes that look wrong and how often they come up
+ZIP_MESS = {
+    "missing": 0.115,
+    "zip_plus_four": 0.002,
+    "far": 0.004,
+    "N/A": 0.0005,
+    "NO CLUE": 0.0005,
+    "00000": 0.0003,
+    "0": 0.0003,
+    "000000": 0.0001,
+    "83": 0.0001,
+}
+
+STREET_NAMES = [
+    "BROADWAY",
+    "EAST 89 STREET",
+    "WEST 72 STREET",
+    "FLATBUSH AVENUE",
+    "QUEENS BOULEVARD",
+    "GRAND CONCOURSE",
+    "HYLAN BOULEVARD",
+    "ATLANTIC AVENUE",
+    "OCEAN PARKWAY",
+    "JAMAICA AVENUE",
+]
+
+LOCATION_TYPES = ["RESIDENTIAL BUILDING", "Street/Sidewalk", "Club/Bar/Restaurant", ""]
+STATUSES = ["Closed", "Open", "Assigned", "Pending", "Started"]
+
+START = dt.datetime(2013, 10, 4)
+PERIOD_SECONDS = 27 * 24 * 3600
+DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+
+def _weights(values):
+    values = np.asarray(values, dtype=float)
+    return values / values.sum()
+
+
+def _pick(rng, options, n, weights=None):
+    return np.asarray(options)[rng.choice(len(options), size=n, p=weights)]
+
+
+def _pick_per_group(rng, groups, options_by_group, n):
+    """Pick a value for each row from a list that depends on the row's group."""
+    out = np.empty(n, dtype=object)
+    for group, options in options_by_group.items():
+        mask = groups == group
+        out[mask] = _pick(rng, options, mask.sum())
+    return out
+
+
+def _complaint_types(rng, boroughs):
+    """Complaint types, with noise over-represented in Manhattan."""
+    names = list(COMPLAINT_TYPES)
+    base = np.array([COMPLAINT_TYPES[name][1] for name in names], dtype=float)
+    biased = base * np.array([MANHATTAN_BIAS.get(name, 1.0) for name in names])
+    out = np.empty(len(boroughs), dtype=object)
+    in_manhattan = boroughs == "MANHATTAN"
+    out[in_manhattan] = _pick(rng, names, in_manhattan.sum(), _weights(biased))
+    out[~in_manhattan] = _pick(rng, names, (~in_manhattan).sum(), _weights(base))
+    return out
+
+
+def _zip_codes_and_cities(rng, boroughs):
+    n = len(boroughs)
+    zips = _pick_per_group(rng, boroughs, {b: v[1] for b, v in BOROUGHS.items()}, n)
+    cities = _pick_per_group(rng, boroughs, {b: v[3] for b, v in BOROUGHS.items()}, n)
+
+    kinds = list(ZIP_MESS) + ["clean"]
+    probabilities = list(ZIP_MESS.values())
+    probabilities.append(1 - sum(probabilities))
+    kind = _pick(rng, kinds, n, probabilities)
+
+    for literal in ["N/A", "NO CLUE", "00000", "0", "000000", "83"]:
+        zips[kind == literal] = literal
+
+    plus_four = kind == "zip_plus_four"
+    suffixes = rng.integers(0, 10000, plus_four.sum())
+    zips[plus_four] = [f"{z}-{s:04d}" for z, s in zip(zips[plus_four], suffixes)]
+
+    far = kind == "far"
+    far_zips = _pick(rng, list(FAR_ZIPS), far.sum())
+    zips[far] = far_zips
+    cities[far] = [FAR_ZIPS[z] for z in far_zips]
+
+    zips[kind == "missing"] = None
+    return zips, cities
+
+
+def generate_chunk(rng, first_key, n):
+    """Generate ``n`` rows of 311 data as a polars DataFrame of strings."""
+    boroughs = _pick(
+        rng, list(BOROUGHS), n, _weights([v[0] for v in BOROUGHS.values()])
+    )
+    complaint_types = _complaint_types(rng, boroughs)
+    descriptors = _pick_per_group(
+        rng, complaint_types, {c: v[2] for c, v in COMPLAINT_TYPES.items()}, n
+    )
+    agencies = np.array([COMPLAINT_TYPES[c][0] for c in complaint_types])
+    zips, cities = _zip_codes_and_cities(rng, boroughs)
+
+    centers = np.array([BOROUGHS[b][2] for b in boroughs]).reshape(-1, 2)
+    latitudes = centers[:, 0] + rng.normal(0, 0.03, n)
+    longitudes = centers[:, 1] + rng.normal(0, 0.03, n)
+
+    created_offsets = np.sort(rng.integers(0, PERIOD_SECONDS, n))[::-1]
+    closed_offsets = created_offsets + rng.integers(600, 10 * 24 * 3600, n)
+    statuses = _pick(rng, STATUSES, n, [0.75, 0.1, 0.08, 0.05, 0.02])
+    street_numbers = rng.integers(1, 3000, n)
+    board_numbers = rng.integers(1, 19, n)
+    streets = _pick(rng, STREET_NAMES, n)
+
+    def timestamps(offsets):
+        seconds = offsets.astype("timedelta64[s]").astype("timedelta64[ms]")
+        return pl.Series(np.datetime64(START, "ms") + seconds)
+
+    df = pl.DataFrame(
+        {
+            "Unique Key": np.arange(first_key, first_key - n, -1),
+            "Created Date": timestamps(created_offsets).dt.strftime(DATE_FORMAT),
+            "Closed Date": timestamps(closed_offsets).dt.strftime(DATE_FORMAT),
+            "Agency": agencies,
+            "Agency Name": [AGENCY_NAMES[a] for a in agencies],
+            "Complaint Type": complaint_types,
+            "Descriptor": descriptors,
+            "Location Type": _pick(rng, LOCATION_TYPES, n),
+            "Incident Zip": pl.Series(zips.tolist(), dtype=pl.String),
+            "Incident Address": [f"{a} {s}" for a, s in zip(street_numbers, streets)],
+            "Street Name": streets,
+            "City": cities,
+            "Status": statuses,
+            "Community Board": [
+                f"{c:02d} {b}" for c, b in zip(board_numbers, boroughs)
+            ],
+            "Borough": boroughs,
+            "Latitude": latitudes.round(6),
+            "Longitude": longitudes.round(6),
+        },
+        strict=False,
+    ).with_columns(
+        pl.when(pl.col("Status") == "Closed").then(pl.col("Closed Date")),
+        pl.format("({}, {})", "Latitude", "Longitude").alias("Location"),
+        pl.col("Unique Key", "Latitude", "Longitude").cast(pl.String),
+    )
+    # Columns that are (almost) never filled in are written out empty
+    return df.with_columns(
+        pl.lit(None, pl.String).alias(c) for c in COLUMNS if c not in df.columns
+    ).select(COLUMNS)
+
+
+def generate(path=DEFAULT_PATH, rows=DEFAULT_ROWS, seed=0, chunk_size=100_000):
+    """Write ``rows`` rows of synthetic 311 data to ``path``, one chunk at a time."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    first_key = 26_600_000 + rows
+    with open(path, "wb") as f:
+        f.write((",".join(COLUMNS) + "\n").encode())
+        for chunk_index, start in enumerate(range(0, rows, chunk_size)):
+            n = min(chunk_size, rows - start)
+            rng = np.random.default_rng([seed, chunk_index])
+            chunk = generate_chunk(rng, first_key - start, n)
+            chunk.write_csv(f, include_header=False)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--output", default=str(DEFAULT_PATH))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args(argv)
+    path = generate(args.output, args.rows, args.seed, args.chunk_size)
+    print(f"Wrote {args.rows:,} rows to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""Load the NYC 311 service requests from a typed, columnar cache.
+
+Chapters 2, 3 and 7 all parse ``../data/311-service-requests.csv`` from
+scratch, reading every column as a string. ``load_complaints`` converts the
+CSV once into an uncompressed Arrow IPC file with proper types (dates as
+Datetime, low-cardinality columns as Categorical, Incident Zip kept as a
+string because it is messy) and memory-maps that file on every later call.
+
+The cache is keyed by the size, modification time and SHA-256 of the CSV,
+so it is rebuilt whenever the source file changes.
+
+    from nyc311 import load_complaints
+
+    pl_complaints = load_complaints()
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import polars as pl
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+DEFAULT_PATH = DATA_DIR / "311-service-requests.csv"
+CACHE_DIR = DATA_DIR / ".cache"
+
+DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+DATE_COLUMNS = [
+    "Created Date",
+    "Closed Date",
+    "Due Date",
+    "Resolution Action Updated Date",
+]
+
+CATEGORICAL_COLUMNS = [
+    "Agency",
+    "Agency Name",
+    "Complaint Type",
+    "Descriptor",
+    "Location Type",
+    "Address Type",
+    "City",
+    "Facility Type",
+    "Status",
+    "Community Board",
+    "Borough",
+    "Park Borough",
+    "Vehicle Type",
+    "Taxi Company Borough",
+]
+
+FLOAT_COLUMNS = [
+    "X Coordinate (State Plane)",
+    "Y Coordinate (State Plane)",
+    "Latitude",
+    "Longitude",
+]
+
+# Bump this when the typed schema changes, so that old caches are rebuilt
+SCHEMA_VERSION = 1
+
+
+def typed_columns(columns):
+    """Expressions that turn the all-string 311 columns into typed ones.
+
+    Columns that are not in ``columns`` are skipped, so this also works on a
+    subset of the file. Incident Zip and every other column stay strings.
+    """
+    present = set(columns)
+    expressions = []
+    if "Unique Key" in present:
+        expressions.append(pl.col("Unique Key").cast(pl.Int64, strict=False))
+    expressions += [
+        pl.col(c).str.to_datetime(DATE_FORMAT, strict=False)
+        for c in DATE_COLUMNS
+        if c in present
+    ]
+    expressions += [
+        pl.col(c).cast(pl.Categorical) for c in CATEGORICAL_COLUMNS if c in present
+    ]
+    expressions += [
+        pl.col(c).cast(pl.Float64, strict=False) for c in FLOAT_COLUMNS if c in present
+    ]
+    return expressions
+
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _manifest_path(source, cache_dir):
+    return Path(cache_dir) / f"{source.stem}.json"
+
+
+def cache_path(source=DEFAULT_PATH, cache_dir=CACHE_DIR):
+    """Return the path of an up-to-date IPC cache for ``source``, building it if needed.
+
+    The manifest next to the cache records the size, mtime and hash of the
+    CSV it was built from. If size and mtime still match, the cache is used
+    as is. If only the mtime changed (the file was touched or copied), the
+    hash decides. Otherwise the cache is rebuilt.
+    """
+    source = Path(source)
+    cache_dir = Path(cache_dir)
+    stat = source.stat()
+    manifest_path = _manifest_path(source, cache_dir)
+    manifest = {}
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+
+    cached = cache_dir / manifest.get("cache_file", "missing")
+    usable = (
+        manifest.get("schema_version") == SCHEMA_VERSION
+        and manifest.get("size") == stat.st_size
+        and cached.exists()
+    )
+    if usable and manifest.get("mtime_ns") == stat.st_mtime_ns:
+        return cached
+
+    sha256 = file_hash(source)
+    if not (usable and manifest.get("sha256") == sha256):
+        cached = cache_dir / f"{source.stem}-{sha256[:16]}.arrow"
+        build_cache(source, cached)
+        if manifest.get("cache_file") not in (None, cached.name):
+            (cache_dir / manifest["cache_file"]).unlink(missing_ok=True)
+
+    manifest = {
+        "schema_version": SCHEMA_VERSION,
+        "source": str(source),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha256,
+        "cache_file": cached.name,
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return cached
+
+
+def build_cache(source, target):
+    """Convert the 311 CSV at ``source`` into a typed IPC file at ``target``.
+
+    The conversion streams, so it works for files larger than memory. The
+    IPC file is written uncompressed, which is what allows memory-mapping it.
+    """
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    lf = pl.scan_csv(source, infer_schema=False)
+    lf = lf.with_columns(typed_columns(lf.collect_schema().names()))
+    # write to a temporary name first, so a crash never leaves half a cache
+    partial = target.with_suffix(".partial")
+    lf.sink_ipc(partial, compression=None)
+    partial.replace(target)
+    return target
+
+
+def scan_complaints(source=DEFAULT_PATH, cache_dir=CACHE_DIR):
+    """Lazily scan the memory-mapped, typed 311 cache."""
+    return pl.scan_ipc(cache_path(source, cache_dir), memory_map=True)
+
+
+def load_complaints(source=DEFAULT_PATH, cache_dir=CACHE_DIR, columns=None):
+    """Read the typed 311 data, memory-mapping the IPC cache."""
+    return pl.read_ipc(cache_path(source, cache_dir), columns=columns, memory_map=True)
+
+
+# Zip code cleaning (chapter 7)
+
+# Values of Incident Zip that mean "unknown", like the na_values of chapter 7
+ZIP_NA_VALUES = ["NO CLUE", "N/A", "0", ""]
+
+# First three digits of a zip code -> state, after the USPS ZIP3 ranges.
+# Military and unassigned prefixes are left out and look up as null.
+ZIP3_RANGES = [
+    (5, 5, "NY"),
+    (6, 7, "PR"),
+    (8, 8, "VI"),
+    (9, 9, "PR"),
+    (10, 27, "MA"),
+    (28, 29, "RI"),
+    (30, 38, "NH"),
+    (39, 49, "ME"),
+    (50, 54, "VT"),
+    (55, 55, "MA"),
+    (56, 59, "VT"),
+    (60, 69, "CT"),
+    (70, 89, "NJ"),
+    (100, 149, "NY"),
+    (150, 196, "PA"),
+    (197, 199, "DE"),
+    (200, 200, "DC"),
+    (201, 201, "VA"),
+    (202, 205, "DC"),
+    (206, 219, "MD"),
+    (220, 246, "VA"),
+    (247, 268, "WV"),
+    (270, 289, "NC"),
+    (290, 299, "SC"),
+    (300, 319, "GA"),
+    (320, 339, "FL"),
+    (341, 349, "FL"),
+    (350, 369, "AL"),
+    (370, 385, "TN"),
+    (386, 397, "MS"),
+    (398, 399, "GA"),
+    (400, 427, "KY"),
+    (430, 459, "OH"),
+    (460, 479, "IN"),
+    (480, 499, "MI"),
+    (500, 528, "IA"),
+    (530, 549, "WI"),
+    (550, 567, "MN"),
+    (569, 569, "DC"),
+    (570, 577, "SD"),
+    (580, 588, "ND"),
+    (590, 599, "MT"),
+    (600, 629, "IL"),
+    (630, 658, "MO"),
+    (660, 679, "KS"),
+    (680, 693, "NE"),
+    (700, 714, "LA"),
+    (716, 729, "AR"),
+    (730, 732, "OK"),
+    (733, 733, "TX"),
+    (734, 749, "OK"),
+    (750, 799, "TX"),
+    (800, 816, "CO"),
+    (820, 831, "WY"),
+    (832, 838, "ID"),
+    (840, 847, "UT"),
+    (850, 865, "AZ"),
+    (870, 884, "NM"),
+    (885, 885, "TX"),
+    (889, 898, "NV"),
+    (900, 961, "CA"),
+    (967, 968, "HI"),
+    (969, 969, "GU"),
+    (970, 979, "OR"),
+    (980, 994, "WA"),
+    (995, 999, "AK"),
+]
+
+# US Census regions
+REGIONS = {
+    "Northeast": ["CT", "MA", "ME", "NH", "NJ", "NY", "PA", "RI", "VT"],
+    "Midwest": ["IA", "IL", "IN", "KS", "MI", "MN", "MO", "ND", "NE", "OH", "SD", "WI"],
+    "South": [
+        "AL",
+        "AR",
+        "DC",
+        "DE",
+        "FL",
+        "GA",
+        "KY",
+        "LA",
+        "MD",
+        "MS",
+        "NC",
+        "OK",
+        "SC",
+        "TN",
+        "TX",
+        "VA",
+        "WV",
+    ],
+    "West": [
+        "AK",
+        "AZ",
+        "CA",
+        "CO",
+        "HI",
+        "ID",
+        "MT",
+        "NM",
+        "NV",
+        "OR",
+        "UT",
+        "WA",
+        "WY",
+    ],
+    "Territories": ["GU", "PR", "VI"],
+}
+
+# Zip codes in these states count as close to New York City
+NEAR_STATES = ["NY", "NJ", "CT"]
+
+STATES = pl.Enum(sorted({state for _, _, state in ZIP3_RANGES}))
+REGION_NAMES = pl.Enum(list(REGIONS))
+
+
+def _zip3_table():
+    """The state and region of every 3-digit prefix, as two arrays of 1000."""
+    region_of = {
+        state: region for region, states in REGIONS.items() for state in states
+    }
+    states = [None] * 1000
+    for start, end, state in ZIP3_RANGES:
+        states[start : end + 1] = [state] * (end - start + 1)
+    regions = [region_of.get(state) for state in states]
+    return pl.Series("state", states, STATES), pl.Series(
+        "region", regions, REGION_NAMES
+    )
+
+
+ZIP3_STATES, ZIP3_REGIONS = _zip3_table()
+
+
+def normalize_zip(column="Incident Zip"):
+    """Clean a zip code column in one expression.
+
+    Does what chapter 7 does in separate passes: the ``na_values``, the
+    truncation to 5 characters of ``fix_zip_codes`` and nulling ``00000``.
+    """
+    zip5 = pl.col(column).str.strip_chars().str.slice(0, 5)
+    unknown = pl.col(column).str.strip_chars().is_in(ZIP_NA_VALUES) | (zip5 == "00000")
+    return pl.when(unknown).then(None).otherwise(zip5).alias(column)
+
+
+def zip_prefix(zip_code):
+    """Index of the 3-digit prefix of a cleaned zip, null unless it has 5 digits."""
+    return (
+        pl.when(zip_code.str.len_bytes() == 5)
+        .then(zip_code.str.slice(0, 3).cast(pl.UInt16, strict=False))
+        .otherwise(None)
+    )
+
+
+def clean_zips(frame, column="Incident Zip"):
+    """Normalize the zips of ``frame`` and look up their state and region.
+
+    Adds ``zip_state``, ``zip_region`` and ``is_far`` (a known zip outside
+    ``NEAR_STATES``) next to the cleaned ``column``. The lookups gather from
+    two 1000-entry arrays indexed by the zip prefix, so they cost no string
+    comparisons.
+    """
+    prefix = zip_prefix(normalize_zip(column))
+    state = pl.lit(ZIP3_STATES).gather(prefix)
+    return frame.with_columns(
+        normalize_zip(column),
+        state.alias("zip_state"),
+        pl.lit(ZIP3_REGIONS).gather(prefix).alias("zip_region"),
+        (state.is_not_null() & ~state.is_in(NEAR_STATES)).alias("is_far"),
+    )
+
+
+# Out-of-core chapter 7 pipeline
+
+# The na_values chapter 7 passes to pd.read_csv, for every column
+CHAPTER_7_NA_VALUES = ["NO CLUE", "N/A", "0"]
+CLEAN_PATH = DATA_DIR / "311-service-requests-clean.parquet"
+
+
+def scan_requests(source=DEFAULT_PATH, na_values=CHAPTER_7_NA_VALUES):
+    """Lazily scan the 311 CSV the way chapter 7 reads it.
+
+    ``na_values`` become nulls while scanning, and every column is read as a
+    string (so Incident Zip keeps its leading zeros and dashes) before
+    ``typed_columns`` types the dates, categories and coordinates.
+    """
+    lf = pl.scan_csv(source, infer_schema=False, null_values=na_values)
+    return lf.with_columns(typed_columns(lf.collect_schema().names()))
+
+
+def clean_requests(lf, column="Incident Zip"):
+    """Chapter 7's clean-up as one lazy query.
+
+    ``zip_has_dash`` and ``zip_is_long`` record what the chapter looks at
+    with ``rows_with_dashes`` and ``long_zip_codes`` before the zips are
+    fixed, and ``zip_raw`` keeps the zip as it was read; then ``clean_zips``
+    truncates ``column``, nulls ``00000`` and adds the state and region.
+    """
+    raw = pl.col(column).str.strip_chars()
+    lf = lf.with_columns(
+        pl.col(column).alias("zip_raw"),
+        raw.str.contains("-", literal=True).fill_null(False).alias("zip_has_dash"),
+        (raw.str.len_chars() > 5).fill_null(False).alias("zip_is_long"),
+    )
+    return clean_zips(lf, column)
+
+
+def zip_report(lf, column="Incident Zip"):
+    """The checks of chapter 7 on a cleaned scan, computed in one streaming run.
+
+    Returns a dict with the rows that had a dash, the distinct long zips
+    (as they were before cleaning), the distinct cleaned zips and the request counts per upper-cased city.
+    The queries share the scan, so the CSV is only read once.
+    """
+    queries = {
+        "rows_with_dashes": lf.filter(pl.col("zip_has_dash")).select(pl.len()),
+        "long_zip_codes": lf.filter(pl.col("zip_is_long"))
+        .select(pl.col("zip_raw").unique())
+        .sort("zip_raw"),
+        "unique_zips": lf.select(pl.col(column).unique()).sort(column),
+        "city_counts": lf.group_by(pl.col("City").cast(pl.String).str.to_uppercase())
+        .agg(pl.len().alias("count"))
+        .sort("count", descending=True),
+    }
+    frames = pl.collect_all(queries.values(), engine="streaming")
+    return dict(zip(queries, frames))
+
+
+def sink_clean_requests(source=DEFAULT_PATH, target=CLEAN_PATH):
+    """Stream the cleaned 311 requests from ``source`` into a Parquet file.
+
+    Nothing is collected in memory: the CSV is scanned, cleaned and written
+    batch by batch, so peak memory does not grow with the size of the file.
+    """
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_suffix(".partial")
+    clean_requests(scan_requests(source)).sink_parquet(partial)
+    partial.replace(target)
+    return target
@@ -0,0 +1,72 @@
+"""Per-group ratios computed in a single pass over the data.
+
+Chapter 3 normalizes the noise complaints of each borough with two
+``value_counts`` (one over the noise complaints, one over all complaints)
+and divides the results. ``grouped_ratio`` counts the numerator and the
+denominator in the same aggregation:
+
+    grouped_ratio(
+        complaints, "Borough", pl.col("Complaint Type") == "Noise - Street/Sidewalk"
+    )
+
+``ratio_table``/``ratio_matrix`` do this for every complaint type at once:
+one group-by over (borough, complaint type) gives all the numerators, and
+the per-borough totals are summed from those same counts, so the data is
+scanned once however many types there are.
+
+All functions take a DataFrame or a LazyFrame and return the same kind,
+except ``ratio_matrix``, which pivots and therefore always returns a
+DataFrame.
+"""
+
+import polars as pl
+
+
+def _finish(frame, lf):
+    return lf if isinstance(frame, pl.LazyFrame) else lf.collect()
+
+
+def grouped_ratio(frame, by, predicate, name="ratio"):
+    """Share of the rows of each ``by`` group for which ``predicate`` holds.
+
+    Returns one row per group with the ``count`` of matching rows, the
+    ``total`` of rows and their quotient in ``name``.
+    """
+    lf = (
+        frame.lazy()
+        .group_by(by)
+        .agg(
+            predicate.fill_null(False).sum().alias("count"),
+            pl.len().alias("total"),
+        )
+        .with_columns((pl.col("count") / pl.col("total")).alias(name))
+    )
+    return _finish(frame, lf)
+
+
+def ratio_table(frame, by, across, name="ratio"):
+    """Share of each ``across`` value within each ``by`` group, in long form.
+
+    ``ratio_table(complaints, "Borough", "Complaint Type")`` has one row per
+    (borough, complaint type) that occurs, with its ``count``, the borough's
+    ``total`` and the ratio of the two.
+    """
+    lf = (
+        frame.lazy()
+        .group_by(by, across)
+        .agg(pl.len().alias("count"))
+        .with_columns(pl.col("count").sum().over(by).alias("total"))
+        .with_columns((pl.col("count") / pl.col("total")).alias(name))
+    )
+    return _finish(frame, lf)
+
+
+def ratio_matrix(frame, by, across):
+    """``ratio_table`` pivoted to one row per ``by`` group and one column per
+    ``across`` value; pairs that never occur get a ratio of 0."""
+    table = ratio_table(frame.lazy(), by, across).collect()
+    return (
+        table.pivot(across, index=by, values="ratio", sort_columns=True)
+        .fill_null(0.0)
+        .sort(by)
+    )
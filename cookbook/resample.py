@@ -0,0 +1,203 @@
+"""Calendar resampling with polars, from scratch or incrementally.
+
+Chapter 6 resamples the hourly weather to months with pandas:
+
+    weather_2012["temperature_c"].resample("M").apply(np.median)
+    is_snowing.astype(float).resample("M").apply(np.mean)
+
+``resample`` does the same on a LazyFrame with ``group_by_dynamic``, for
+hour, day, week or month buckets:
+
+    monthly = resample(
+        pl.scan_csv("../data/weather_2012.csv", try_parse_dates=True),
+        "month",
+        pl.col("temperature_c").median(),
+        pl.col("weather").str.contains("Snow").mean().alias("snow_fraction"),
+    ).collect()
+
+``IncrementalResampler`` keeps partial aggregates per bucket instead, so
+that appending a few new hourly rows only recomputes the buckets they fall
+into. Means come from stored sums and counts; medians are either exact
+(the values of each bucket are kept) or approximate (a fixed-width
+histogram per bucket, off by at most half a bin width).
+"""
+
+import polars as pl
+
+# group_by_dynamic/truncate intervals for the calendar buckets
+BUCKETS = {"hour": "1h", "day": "1d", "week": "1w", "month": "1mo"}
+
+
+def _interval(every):
+    return BUCKETS.get(every, every)
+
+
+def resample(lf, every, *aggs, time_column="date_time"):
+    """Aggregate ``lf`` into calendar buckets of ``every``.
+
+    ``every`` is one of "hour", "day", "week" or "month", or any polars
+    interval such as "1mo". Each bucket is labelled by its start, like
+    ``dt.truncate`` would label it.
+    """
+    return (
+        lf.lazy()
+        .sort(time_column)
+        .group_by_dynamic(time_column, every=_interval(every))
+        .agg(*aggs)
+    )
+
+
+class IncrementalResampler:
+    """Per-bucket mean and median of one value, maintained as rows arrive.
+
+    ``value`` is a column name or an expression, for instance
+    ``pl.col("weather").str.contains("Snow")`` for the share of snowy hours.
+    ``median`` is "exact", "sketch" or None to only keep the mean. The
+    sketch is a histogram with bins of ``bin_width``; its medians average
+    the centres of the bins holding the two middle values, so they are
+    within half a bin width of the exact ones (``median_error`` allows a
+    whole bin width, for rounding at the bin edges).
+
+        monthly = IncrementalResampler("month", "temperature_c")
+        monthly.update(weather_2012)
+        monthly.update(new_hours)  # only touches the months of new_hours
+        monthly.result()
+    """
+
+    def __init__(
+        self,
+        every="month",
+        value="temperature_c",
+        time_column="date_time",
+        median="exact",
+        bin_width=0.1,
+    ):
+        if median not in ("exact", "sketch", None):
+            raise ValueError(
+                f"median must be 'exact', 'sketch' or None, not {median!r}"
+            )
+        self.every = _interval(every)
+        self.value = pl.col(value) if isinstance(value, str) else value
+        self.time_column = time_column
+        self.median = median
+        self.bin_width = bin_width
+        self.median_error = bin_width if median == "sketch" else 0.0
+        self._partials = pl.DataFrame(
+            schema={"bucket": pl.Datetime("us"), "count": pl.UInt32, "sum": pl.Float64}
+        )
+        # exact medians keep the values of each bucket, sketches a histogram
+        self._values = {}
+        self._histogram = None
+        self._result = self._empty_result()
+
+    def _empty_result(self):
+        schema = {
+            "bucket": pl.Datetime("us"),
+            "count": pl.UInt32,
+            "mean": pl.Float64,
+        }
+        if self.median:
+            schema["median"] = pl.Float64
+        return pl.DataFrame(schema=schema)
+
+    def update(self, rows):
+        """Fold new rows in and return the recomputed rows of the affected buckets."""
+        new = (
+            rows.lazy()
+            .select(
+                pl.col(self.time_column)
+                .cast(pl.Datetime("us"))
+                .dt.truncate(self.every)
+                .alias("bucket"),
+                self.value.cast(pl.Float64).alias("value"),
+            )
+            .drop_nulls()
+            .collect()
+        )
+        affected = new["bucket"].unique()
+        self._partials = _merge(
+            self._partials,
+            new.group_by("bucket").agg(
+                pl.len().cast(pl.UInt32).alias("count"),
+                pl.col("value").sum().alias("sum"),
+            ),
+            ["bucket"],
+        )
+        changed = self._partials.filter(pl.col("bucket").is_in(affected.implode()))
+        changed = changed.select(
+            "bucket", "count", (pl.col("sum") / pl.col("count")).alias("mean")
+        )
+        if self.median == "exact":
+            changed = changed.join(self._update_exact(new), on="bucket")
+        elif self.median == "sketch":
+            changed = changed.join(self._update_sketch(new, affected), on="bucket")
+
+        self._result = pl.concat(
+            [self._result.filter(~pl.col("bucket").is_in(affected.implode())), changed]
+        ).sort("bucket")
+        return changed.sort("bucket")
+
+    def _update_exact(self, new):
+        # only the buckets that got new values are touched
+        medians = []
+        for (bucket,), group in new.partition_by("bucket", as_dict=True).items():
+            values = group["value"]
+            if bucket in self._values:
+                values = pl.concat([self._values[bucket], values])
+            self._values[bucket] = values
+            medians.append((bucket, values.median()))
+        return pl.DataFrame(
+            medians,
+            schema={"bucket": pl.Datetime("us"), "median": pl.Float64},
+            orient="row",
+        )
+
+    def _update_sketch(self, new, affected):
+        histogram = new.group_by(
+            "bucket",
+            (pl.col("value") / self.bin_width).floor().cast(pl.Int64).alias("bin"),
+        ).agg(pl.len().cast(pl.UInt32).alias("count"))
+        if self._histogram is None:
+            self._histogram = histogram
+        else:
+            self._histogram = _merge(self._histogram, histogram, ["bucket", "bin"])
+        return (
+            self._histogram.filter(pl.col("bucket").is_in(affected.implode()))
+            .sort("bucket", "bin")
+            .with_columns(
+                pl.col("count").cum_sum().over("bucket").alias("below"),
+                pl.col("count").sum().over("bucket").alias("total"),
+            )
+            .group_by("bucket")
+            .agg(
+                # the two middle values (the same one for odd counts) fall in
+                # the first bins whose running count reaches their rank
+                (
+                    (
+                        _bin_of_rank((pl.col("total") + 1) // 2)
+                        + _bin_of_rank(pl.col("total") // 2 + 1)
+                    )
+                    / 2
+                    + 0.5
+                )
+                .mul(self.bin_width)
+                .alias("median")
+            )
+        )
+
+    def result(self):
+        """Mean (and median) of every bucket seen so far."""
+        return self._result
+
+
+def _bin_of_rank(rank):
+    return pl.col("bin").filter(pl.col("below") >= rank).first()
+
+
+def _merge(state, new, keys):
+    """Add the counts and sums of ``new`` into ``state``, matching on ``keys``."""
+    return (
+        pl.concat([state, new.select(state.columns)])
+        .group_by(keys)
+        .agg(pl.exclude(keys).sum())
+    )
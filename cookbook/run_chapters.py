@@ -0,0 +1,205 @@
+"""Run the chapter scripts headlessly and profile every cell.
+
+Each ``Chapter *.py`` is split into its ``# %%`` cells, which are executed
+in order in one namespace, the way an interactive window would run them.
+Chapters run in parallel, one per worker process, with matplotlib's
+non-interactive Agg backend so that ``plt.show()`` returns immediately.
+
+For every cell the report has the wall and CPU time, the peak RSS growth
+while it ran and, with ``--tracemalloc``, the peak of Python-level
+allocations. Each chapter runs twice, in separate processes: once timed
+and once with the RSS sampler thread (and tracing, which slows the cells
+down, so it is off by default), so that polling memory does not inflate
+the timings. Cells
+are tagged "polars" when they use polars or one of the cookbook helper
+modules, "pandas" when they run other code and "none" when they only hold
+comments. A failing cell is reported with its error and the chapter goes on
+with the next cell.
+
+    python run_chapters.py --output chapters.csv
+    python run_chapters.py "Chapter 6*" --tracemalloc --output chapter6.json
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from benchmark import RssSampler, write_results
+
+COOKBOOK_DIR = Path(__file__).resolve().parent
+CELL_MARKER = re.compile(r"^# %%(.*)$")
+
+# the cookbook's own modules are polars code, whatever names they import;
+# bootstrap only hands out the libraries the chapters already used
+HELPER_MODULES = sorted(
+    p.stem
+    for p in COOKBOOK_DIR.glob("*.py")
+    if not p.stem.startswith("Chapter") and p.stem != "bootstrap"
+)
+POLARS_CODE = re.compile(
+    r"\bpl\.|\bpolars\b|^\s*from (%s) import" % "|".join(HELPER_MODULES), re.M
+)
+
+
+def split_cells(source):
+    """``(first_line, title, code)`` of each ``# %%`` cell of a script.
+
+    Lines before the first marker form a cell of their own. ``first_line``
+    is 1-based, so tracebacks point at the right line of the script.
+    """
+    cells = []
+    title, start, lines = "", 1, []
+    for number, line in enumerate(source.splitlines(keepends=True), start=1):
+        match = CELL_MARKER.match(line)
+        if match:
+            if "".join(lines).strip():
+                cells.append((start, title, "".join(lines)))
+            title, start, lines = match.group(1).strip(), number, [line]
+        else:
+            lines.append(line)
+    if "".join(lines).strip():
+        cells.append((start, title, "".join(lines)))
+    return cells
+
+
+def cell_library(code):
+    """ "polars", "pandas" or "none" (comments only) for a cell's code."""
+    statements = [
+        line
+        for line in code.splitlines()
+        if line.strip() and not line.lstrip().startswith("#")
+    ]
+    if not statements:
+        return "none"
+    return "polars" if POLARS_CODE.search("\n".join(statements)) else "pandas"
+
+
+def run_chapter(path, measure="time", trace=False):
+    """Execute the cells of one chapter and return one result dict per cell.
+
+    With ``measure="time"`` the cells are only timed; with ``"memory"``
+    their peak RSS growth (and with ``trace`` their traced peak) is
+    recorded instead, and the time fields are left empty.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    path = Path(path)
+    # the chapters use paths relative to the cookbook folder and import its modules
+    os.chdir(COOKBOOK_DIR)
+    sys.path.insert(0, str(COOKBOOK_DIR))
+    namespace = {"__name__": "__main__", "__file__": str(path)}
+    results = []
+    for index, (first_line, title, code) in enumerate(
+        split_cells(path.read_text(encoding="utf-8"))
+    ):
+        result = {
+            "chapter": path.stem,
+            "cell": index,
+            "line": first_line,
+            "title": title,
+            "library": cell_library(code),
+            "wall_time_s": None,
+            "cpu_time_s": None,
+            "peak_rss_mb": None,
+            "peak_traced_mb": None,
+            "error": None,
+        }
+        # pad with blank lines so line numbers match the script
+        compiled = compile("\n" * (first_line - 1) + code, str(path), "exec")
+        if measure == "time":
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                exec(compiled, namespace)
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            result["wall_time_s"] = time.perf_counter() - wall
+            result["cpu_time_s"] = time.process_time() - cpu
+        else:
+            if trace:
+                tracemalloc.start()
+            try:
+                with RssSampler() as rss:
+                    exec(compiled, namespace)
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            result["peak_rss_mb"] = rss.peak_mb
+            if trace:
+                result["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+        plt.close("all")
+        results.append(result)
+    return results
+
+
+def chapter_paths(patterns=None):
+    patterns = patterns or ["Chapter *.py"]
+    paths = {p for pattern in patterns for p in COOKBOOK_DIR.glob(pattern)}
+    return sorted(paths)
+
+
+def run_chapters(paths, max_workers=None, trace=False):
+    """Run chapters in parallel worker processes; results in chapter order.
+
+    Every chapter is run once timed and once sampling memory, each time in
+    a fresh worker process, and the two results of each cell are merged.
+    """
+    context = get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=context, max_tasks_per_child=1
+    ) as pool:
+        futures = [
+            (
+                pool.submit(run_chapter, str(path), "time"),
+                pool.submit(run_chapter, str(path), "memory", trace),
+            )
+            for path in paths
+        ]
+        results = []
+        for timed, sampled in futures:
+            for result, memory in zip(timed.result(), sampled.result()):
+                result["peak_rss_mb"] = memory["peak_rss_mb"]
+                result["peak_traced_mb"] = memory["peak_traced_mb"]
+                print(format_result(result), flush=True)
+                results.append(result)
+    return results
+
+
+def format_result(result):
+    name = f"{result['chapter'][:10]} cell {result['cell']:<3} {result['library']:<7}"
+    if result["error"]:
+        return f"{name} FAILED {result['error'].splitlines()[0]}"
+    return (
+        f"{name} {result['wall_time_s'] * 1000:10.2f} ms"
+        f" {result['cpu_time_s'] * 1000:10.2f} ms cpu"
+        f" {result['peak_rss_mb']:9.1f} MB"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "chapters", nargs="*", help='glob patterns of scripts (default "Chapter *.py")'
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--tracemalloc", action="store_true", help="also record traced Python peaks"
+    )
+    parser.add_argument("--output", help="write the results to a .csv or .json file")
+    args = parser.parse_args(argv)
+
+    results = run_chapters(chapter_paths(args.chapters), args.workers, args.tracemalloc)
+    if args.output:
+        write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""Propose and apply the narrowest safe dtypes for a CSV file.
+
+Chapters 2, 3 and 7 read the 311 data with ``dtype="unicode"``, so every
+column is a string, and chapter 5 keeps ``station_name``, ``climate_id``,
+``longitude`` and ``latitude`` as the same full value on each hourly row of
+``weather_2012.csv``. ``propose_dtypes`` reads a sample of a file as strings
+and picks a dtype for every column:
+
+* nothing but nulls: ``Null``;
+* integers (without leading zeros, so zip codes stay text): the narrowest
+  of UInt8 ... Int64 that holds them;
+* decimals without leading zeros (0.5 is fine, 01.5 is not) with at most
+  6 significant digits: Float32, others Float64;
+* timestamps in one of ``DATETIME_FORMATS``: Datetime, or Date;
+* strings repeating enough (at most ``max_category_share`` distinct values
+  per non-null value): Enum, else String.
+
+Columns holding a single value are flagged as constant. ``read_optimized``
+then scans the whole file with those dtypes. The sample only decides the
+kind of each column: integer widths, Float32, Enum categories and constant
+columns are checked on the full data, and parsing is strict, so a value
+the sample did not foresee fails the read instead of turning into a null.
+
+    from schema_optimizer import memory_report, read_optimized
+
+    weather_2012 = read_optimized("../data/weather_2012.csv")
+    memory_report(pl.read_csv("../data/weather_2012.csv", infer_schema=False), weather_2012)
+
+``python schema_optimizer.py ../data/311-service-requests.csv`` prints the
+proposal and the memory of each column before and after.
+"""
+
+import argparse
+from collections import namedtuple
+
+import polars as pl
+
+from arrow_bridge import buffers
+
+DATETIME_FORMATS = [
+    ("%Y-%m-%d %H:%M:%S", pl.Datetime),
+    ("%Y-%m-%dT%H:%M:%S", pl.Datetime),
+    ("%m/%d/%Y %I:%M:%S %p", pl.Datetime),
+    ("%m/%d/%Y %H:%M:%S", pl.Datetime),
+    ("%Y-%m-%d", pl.Date),
+    ("%m/%d/%Y", pl.Date),
+]
+
+# (dtype, lowest, highest), narrowest first
+UNSIGNED_DTYPES = [
+    (pl.UInt8, 0, 2**8 - 1),
+    (pl.UInt16, 0, 2**16 - 1),
+    (pl.UInt32, 0, 2**32 - 1),
+    (pl.UInt64, 0, 2**64 - 1),
+]
+SIGNED_DTYPES = [
+    (pl.Int8, -(2**7), 2**7 - 1),
+    (pl.Int16, -(2**15), 2**15 - 1),
+    (pl.Int32, -(2**31), 2**31 - 1),
+    (pl.Int64, -(2**63), 2**63 - 1),
+]
+
+# Float32 round-trips every decimal with up to 6 significant digits
+FLOAT32_DIGITS = 6
+
+# kind: "null", "integer", "float", "temporal", "category" or "string";
+# format is the strptime format of temporal columns
+Proposal = namedtuple("Proposal", ["kind", "dtype", "format", "constant"])
+
+
+def read_sample(source, sample_rows=100_000):
+    """The first ``sample_rows`` rows of a CSV file, every column as a string."""
+    return pl.read_csv(source, infer_schema=False, n_rows=sample_rows)
+
+
+def integer_dtype(low, high):
+    """The narrowest integer dtype holding every value from ``low`` to ``high``."""
+    for dtype, lowest, highest in UNSIGNED_DTYPES if low >= 0 else SIGNED_DTYPES:
+        if lowest <= low and high <= highest:
+            return dtype
+    return pl.Int64
+
+
+def _all_parse(values, parsed):
+    return parsed.null_count() == values.null_count()
+
+
+def propose_dtype(values, max_category_share=0.5):
+    """A ``Proposal`` for one all-string column of a sample."""
+    present = values.drop_nulls()
+    constant = len(present) == len(values) and present.n_unique() == 1
+    if present.is_empty():
+        return Proposal("null", pl.Null, None, False)
+
+    integers = values.cast(pl.Int64, strict=False)
+    if _all_parse(values, integers) and (integers.cast(pl.String) == values).all():
+        dtype = integer_dtype(integers.min(), integers.max())
+        return Proposal("integer", dtype, None, constant)
+
+    # "01234" is a code, not a number: reading it as one loses the zero
+    zero_padded = present.str.contains(r"^[+\-]?0\d").any()
+    floats = values.cast(pl.Float64, strict=False)
+    if not zero_padded and _all_parse(values, floats):
+        # count the digits after dropping sign, point and leading zeros
+        digits = present.str.replace_all(r"[+\-.]", "").str.strip_chars_start("0")
+        plain = present.str.contains(r"^[+\-]?\d*\.?\d*$").all()
+        if plain and digits.str.len_chars().max() <= FLOAT32_DIGITS:
+            return Proposal("float", pl.Float32, None, constant)
+        return Proposal("float", pl.Float64, None, constant)
+
+    for format, dtype in DATETIME_FORMATS:
+        if dtype == pl.Date:
+            parsed = values.str.to_date(format, strict=False)
+        else:
+            parsed = values.str.to_datetime(format, strict=False)
+        if _all_parse(values, parsed):
+            return Proposal("temporal", dtype, format, constant)
+
+    if present.n_unique() <= max(1, max_category_share * len(present)):
+        return Proposal("category", pl.Enum, None, constant)
+    return Proposal("string", pl.String, None, constant)
+
+
+def propose_dtypes(source, sample_rows=100_000, max_category_share=0.5):
+    """A ``Proposal`` per column of a CSV file, from a sample of its rows."""
+    sample = read_sample(source, sample_rows)
+    return {
+        column.name: propose_dtype(column, max_category_share)
+        for column in sample.iter_columns()
+    }
+
+
+def proposal_table(dtypes):
+    """The proposals of ``propose_dtypes`` as a DataFrame, to display."""
+    return pl.DataFrame(
+        {
+            "column": list(dtypes),
+            "kind": [p.kind for p in dtypes.values()],
+            "dtype": [str(p.dtype) for p in dtypes.values()],
+            "format": [p.format for p in dtypes.values()],
+            "constant": [p.constant for p in dtypes.values()],
+        }
+    )
+
+
+def _parse(column, proposal):
+    expression = pl.col(column)
+    if proposal.kind == "null":
+        return expression.cast(pl.Null)
+    if proposal.kind == "integer":
+        # the width is chosen on the full data once it is read
+        return expression.cast(pl.Int64)
+    if proposal.kind == "float":
+        # Float32 is checked on the full data once it is read
+        return expression.cast(pl.Float64)
+    if proposal.kind == "temporal":
+        if proposal.dtype == pl.Date:
+            return expression.str.to_date(proposal.format)
+        return expression.str.to_datetime(proposal.format)
+    if proposal.kind == "category":
+        return expression.cast(pl.Categorical)
+    return expression
+
+
+def fits_float32(values):
+    """Whether every value has at most 6 significant digits and keeps them as a Float32."""
+    present = values.drop_nulls()
+    rounded = present.round_sig_figs(FLOAT32_DIGITS)
+    kept = present.cast(pl.Float32).cast(pl.Float64).round_sig_figs(FLOAT32_DIGITS)
+    return bool(
+        ((rounded - present).abs() <= present.abs() * 1e-9).all()
+        and (kept == rounded).all()
+    )
+
+
+def _narrow(frame, dtypes):
+    """Integers to the narrowest width, floats to Float32 where every value
+    fits and Categoricals to Enums of their values."""
+    expressions = []
+    for column, proposal in dtypes.items():
+        if proposal.kind == "integer" and frame[column].null_count() < frame.height:
+            dtype = integer_dtype(frame[column].min(), frame[column].max())
+            expressions.append(pl.col(column).cast(dtype))
+        elif proposal.dtype == pl.Float32 and fits_float32(frame[column]):
+            expressions.append(pl.col(column).cast(pl.Float32))
+        elif proposal.kind == "category":
+            categories = frame[column].cast(pl.String).unique().drop_nulls().sort()
+            expressions.append(pl.col(column).cast(pl.Enum(categories)))
+    return frame.with_columns(expressions)
+
+
+def read_optimized(source, dtypes=None, drop_constants=False, sample_rows=100_000):
+    """Read a whole CSV file with the dtypes of ``propose_dtypes``.
+
+    Without ``dtypes`` they are proposed from the first ``sample_rows`` rows.
+    With ``drop_constants`` the columns holding a single value in the whole
+    file are left out; their value is the first row of ``read_sample``.
+    """
+    if dtypes is None:
+        dtypes = propose_dtypes(source, sample_rows)
+    frame = (
+        pl.scan_csv(source, infer_schema=False)
+        .select(_parse(column, proposal) for column, proposal in dtypes.items())
+        .collect(engine="streaming")
+        .rechunk()
+    )
+    if drop_constants:
+        # constant in the sample is not constant in the file
+        constants = [
+            column
+            for column, proposal in dtypes.items()
+            if proposal.constant
+            and frame[column].null_count() == 0
+            and frame[column].n_unique() == 1
+        ]
+        frame = frame.drop(constants)
+        dtypes = {c: p for c, p in dtypes.items() if c not in constants}
+    return _narrow(frame, dtypes)
+
+
+def column_bytes(column):
+    """Bytes of the buffers behind a polars column.
+
+    Unlike ``Series.estimated_size`` this counts the 16-byte view of every
+    string, which is most of the memory of short repeated strings.
+    """
+    # chunks of a Categorical or Enum share its categories
+    return sum(size for _, size in set(buffers(column)))
+
+
+def memory_report(before, after):
+    """Memory and dtype of each column of two versions of a frame."""
+    rows = []
+    for name in before.columns:
+        optimized = after.get_column(name, default=None)
+        rows.append(
+            {
+                "column": name,
+                "before_dtype": str(before[name].dtype),
+                "after_dtype": None if optimized is None else str(optimized.dtype),
+                "before_bytes": column_bytes(before[name]),
+                "after_bytes": 0 if optimized is None else column_bytes(optimized),
+            }
+        )
+    return (
+        pl.DataFrame(rows)
+        .with_columns(saved_bytes=pl.col("before_bytes") - pl.col("after_bytes"))
+        .sort("saved_bytes", descending=True)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="CSV file to optimize")
+    parser.add_argument("--sample-rows", type=int, default=100_000)
+    parser.add_argument("--drop-constants", action="store_true")
+    args = parser.parse_args(argv)
+
+    dtypes = propose_dtypes(args.source, args.sample_rows)
+    before = pl.read_csv(args.source, infer_schema=False)
+    after = read_optimized(args.source, dtypes, args.drop_constants)
+    with pl.Config(tbl_rows=-1, tbl_width_chars=200, fmt_str_lengths=40):
+        print(proposal_table(dtypes))
+        report = memory_report(before, after)
+        print(report)
+    total_before, total_after = (
+        report["before_bytes"].sum(),
+        report["after_bytes"].sum(),
+    )
+    print(
+        f"{total_before / 2**20:.1f} MB as strings, {total_after / 2**20:.1f} MB optimized"
+        f" ({total_after / total_before:.0%})"
+    )
+
+
+if __name__ == "__main__":
+    main()
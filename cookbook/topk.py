@@ -0,0 +1,119 @@
+"""Streaming top-k of a column, exactly or within a fixed memory budget.
+
+Chapter 2 finds the most common complaint types with
+
+    complaints["Complaint Type"].value_counts()[:10]
+
+which needs the whole column and its full count table in memory. ``top_k``
+reads the CSV in batches instead and folds each batch's counts into a
+``HeavyHitters`` summary:
+
+    top_k("../data/311-service-requests.csv", "Complaint Type", k=10)
+
+With ``capacity=None`` the summary is an exact hash aggregate, which holds
+one row per distinct value. With a ``capacity`` it is a Space-Saving summary
+(Metwally et al.) that never holds more than ``capacity`` values: each count
+is an overestimate by at most the ``error`` reported next to it, and any
+value that was dropped occurred at most ``floor`` times, which is itself at
+most (rows seen) / ``capacity``.
+
+Summaries are plain DataFrames underneath, so they pickle, and two of them
+can be combined with ``merge`` (the mergeable form of Space-Saving), for
+instance after counting the files of a feed in separate worker processes.
+"""
+
+import polars as pl
+
+
+class HeavyHitters:
+    """Counts of the most frequent values of a stream, exact or approximate."""
+
+    def __init__(self, capacity=None, dtype=pl.String):
+        self.capacity = capacity
+        self.counts = pl.DataFrame(
+            schema={"value": dtype, "count": pl.UInt64, "error": pl.UInt64}
+        )
+        # no value outside ``counts`` occurred more often than this
+        self.floor = 0
+        self.rows = 0
+
+    def update(self, values):
+        """Fold a batch of values (a Series) into the summary."""
+        batch = HeavyHitters(self.capacity, values.dtype)
+        batch.counts = (
+            values.drop_nulls()
+            .rename("value")
+            .value_counts(name="count")
+            .with_columns(pl.col("count").cast(pl.UInt64), error=pl.lit(0, pl.UInt64))
+        )
+        batch.rows = len(values)
+        batch._truncate()
+        self.merge(batch)
+        return self
+
+    def merge(self, other):
+        """Combine the summary of another part of the stream into this one.
+
+        A value missing from one side may still have occurred up to that
+        side's ``floor`` times, so it is credited with the floor as both
+        count and error.
+        """
+        merged = self.counts.join(
+            other.counts, on="value", how="full", coalesce=True, suffix="_other"
+        ).select(
+            "value",
+            (
+                pl.col("count").fill_null(self.floor)
+                + pl.col("count_other").fill_null(other.floor)
+            ).alias("count"),
+            (
+                pl.col("error").fill_null(self.floor)
+                + pl.col("error_other").fill_null(other.floor)
+            ).alias("error"),
+        )
+        self.counts = merged
+        self.floor += other.floor
+        self.rows += other.rows
+        self._truncate()
+        return self
+
+    def _truncate(self):
+        counts = self.counts.sort("count", "value", descending=[True, False])
+        if self.capacity is not None and counts.height > self.capacity:
+            dropped = counts["count"][self.capacity]
+            self.floor = max(self.floor, dropped)
+            counts = counts.head(self.capacity)
+        self.counts = counts
+
+    def top(self, k=10):
+        """The ``k`` most frequent values, with ``count`` (an upper bound),
+        ``error`` and ``lower_bound = count - error``. In exact mode the
+        error is always 0."""
+        return self.counts.head(k).with_columns(
+            (pl.col("count") - pl.col("error")).alias("lower_bound")
+        )
+
+    @property
+    def max_error(self):
+        """Upper bound on the overestimate of any reported count."""
+        return self.floor
+
+
+def iter_column(source, column, batch_size=100_000):
+    """Stream one column of a CSV as Series of at most ``batch_size`` values."""
+    lf = pl.scan_csv(source, infer_schema=False).select(column)
+    for batch in lf.collect_batches(chunk_size=batch_size):
+        yield batch.to_series()
+
+
+def count_column(source, column, capacity=None, batch_size=100_000):
+    """``HeavyHitters`` summary of one column of a CSV, read in batches."""
+    summary = HeavyHitters(capacity)
+    for values in iter_column(source, column, batch_size):
+        summary.update(values)
+    return summary
+
+
+def top_k(source, column, k=10, capacity=None, batch_size=100_000):
+    """The ``k`` most common values of ``column`` in the CSV ``source``."""
+    return count_column(source, column, capacity, batch_size).top(k)
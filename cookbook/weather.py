@@ -0,0 +1,560 @@
+"""Download and clean hourly weather data from Environment Canada with polars.
+
+This is the polars version of ``download_weather_month`` and ``clean_data``
+from chapter 5, plus a downloader that fetches many months at once:
+
+    from weather import download_weather_year
+
+    weather_2012 = download_weather_year(2012)
+
+Months are fetched concurrently by a small thread pool, failed requests are
+retried with exponential backoff, and every raw download is kept on disk
+under ``data/.cache/weather/<station>/<year>-<month>.csv``, so only months
+that were never downloaded before hit the network. Downloads are parsed
+through a ``SchemaNormalizer``, which works out the column projection and
+renaming once per distinct header instead of once per month.
+
+``backfill`` scales this to many stations and years: it keeps a manifest of
+the (station, year, month) slices already in the Parquet dataset, so reruns
+only fetch what is missing, and parses downloads in a pool of processes.
+
+``weather_standin.py`` serves the same CSV format locally; pass its ``url``
+as ``base_url`` to run all of this without network access.
+"""
+
+import csv
+import functools
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from datetime import date, datetime
+from pathlib import Path
+from urllib.parse import urlencode
+
+import polars as pl
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+CACHE_DIR = DATA_DIR / ".cache" / "weather"
+DATASET_DIR = DATA_DIR / "weather_parquet"
+MANIFEST_NAME = "_manifest.json"
+
+BASE_URL = "http://climate.weather.gc.ca"
+BULK_DATA_PATH = "/climate_data/bulk_data_e.html"
+MONTREAL_STATION_ID = 5415
+
+# HTTP status codes worth retrying; anything else is a real error
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# connections that drop or stop halfway through a response
+RETRY_ERRORS = (
+    urllib.error.URLError,
+    TimeoutError,
+    ConnectionResetError,
+    http.client.IncompleteRead,
+)
+
+RENAME = {
+    "Date/Time (LST)": "date_time",
+    "Longitude (x)": "Longitude",
+    "Latitude (y)": "Latitude",
+    "Station Name": "Station_Name",
+    "Climate ID": "Climate_ID",
+    "Temp (°C)": "Temperature_C",
+    "Dew Point Temp (°C)": "Dew_Point_Temp_C",
+    "Rel Hum (%)": "Relative_Humidity",
+    "Wind Spd (km/h)": "Wind_Speed_kmh",
+    "Visibility (km)": "Visibility_km",
+    "Stn Press (kPa)": "Station_Pressure_kPa",
+    "Weather": "Weather",
+}
+
+# Columns and types of data/weather_2012.csv, which every ingested month gets
+WEATHER_SCHEMA = {
+    "date_time": pl.Datetime("us"),
+    "longitude": pl.Float64,
+    "latitude": pl.Float64,
+    "station_name": pl.String,
+    "climate_id": pl.String,
+    "temperature_c": pl.Float64,
+    "dew_point_temp_c": pl.Float64,
+    "relative_humidity": pl.Int64,
+    "wind_speed_kmh": pl.Int64,
+    "visibility_km": pl.Float64,
+    "station_pressure_kpa": pl.Float64,
+    "weather": pl.String,
+}
+
+
+def bulk_data_url(station_id, year, month, base_url=BASE_URL):
+    query = urlencode(
+        {
+            "format": "csv",
+            "stationID": station_id,
+            "Year": year,
+            "Month": month,
+            "timeframe": 1,
+            "submit": "Download Data",
+        }
+    )
+    return f"{base_url}{BULK_DATA_PATH}?{query}"
+
+
+def clean_name(name):
+    """The name ``clean_data`` gives to a raw download column."""
+    name = name.replace('ï»¿"', "").replace("Â", "").strip('"')
+    return RENAME.get(name, name).lower()
+
+
+def clean_data(data):
+    """Polars version of chapter 5's ``clean_data``.
+
+    The downloader does not use this: it reads through a ``SchemaNormalizer``,
+    which does the same renaming without parsing the columns it drops.
+    """
+    data = data.select(c for c in data.columns if data[c].null_count() == 0)
+    data = data.drop(["Year", "Month", "Day", "Time (LST)"], strict=False)
+    data = data.rename({c: clean_name(c) for c in data.columns})
+    data = data.with_columns(
+        pl.col("date_time").str.to_datetime("%Y-%m-%d %H:%M")
+    ).select("date_time", pl.exclude("date_time"))
+    return data
+
+
+class SchemaNormalizer:
+    """Column projection, types and renaming for one raw download header.
+
+    Everything ``clean_data`` does to the columns depends only on the
+    header, so it is worked out once per distinct header (see
+    ``normalizer_for``) and then applied while reading: only the columns of
+    ``WEATHER_SCHEMA`` are parsed, straight into their final types, and the
+    empty flag columns are never materialized. Unlike ``clean_data``, a
+    column with gaps in it is kept with nulls instead of being dropped, so
+    every month comes out with the same schema.
+    """
+
+    def __init__(self, header):
+        self.header = tuple(header)
+        self.mapping = {}
+        for raw_name in self.header:
+            name = clean_name(raw_name)
+            if name in WEATHER_SCHEMA and name not in self.mapping.values():
+                self.mapping[raw_name] = name
+        self.read_dtypes = {
+            raw_name: pl.String if name == "date_time" else WEATHER_SCHEMA[name]
+            for raw_name, name in self.mapping.items()
+        }
+
+    def read(self, source):
+        """Read a raw download (bytes or path) into ``WEATHER_SCHEMA``."""
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        data = pl.read_csv(
+            source,
+            columns=list(self.mapping),
+            schema_overrides=self.read_dtypes,
+            # every field is quoted, so empty values arrive as "" rather than nothing
+            null_values=[""],
+        ).rename(self.mapping)
+        if "date_time" in data.columns:
+            data = data.with_columns(
+                pl.col("date_time").str.to_datetime("%Y-%m-%d %H:%M")
+            )
+        return data.select(
+            (pl.col(name) if name in data.columns else pl.lit(None))
+            .cast(dtype)
+            .alias(name)
+            for name, dtype in WEATHER_SCHEMA.items()
+        )
+
+
+@functools.lru_cache(maxsize=64)
+def normalizer_for(header):
+    """The ``SchemaNormalizer`` of a header, built once per distinct header."""
+    return SchemaNormalizer(header)
+
+
+def read_header(raw):
+    """Column names of a raw download, without parsing the rest of it."""
+    first_line = raw.split(b"\n", 1)[0].decode("utf-8-sig")
+    return tuple(next(csv.reader([first_line])))
+
+
+def read_month(raw):
+    """Parse the bytes of one downloaded month into ``WEATHER_SCHEMA``."""
+    return normalizer_for(read_header(raw)).read(raw)
+
+
+def cache_file(station_id, year, month, cache_dir=CACHE_DIR):
+    return Path(cache_dir) / str(station_id) / f"{year}-{month:02d}.csv"
+
+
+def fetch(url, retries=3, backoff=0.5, timeout=30):
+    """GET ``url``, retrying transient failures with exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRY_STATUS or attempt == retries:
+                raise
+        except RETRY_ERRORS:
+            if attempt == retries:
+                raise
+        time.sleep(backoff * 2**attempt)
+
+
+def download_raw_month(
+    station_id, year, month, base_url=BASE_URL, cache_dir=CACHE_DIR, **fetch_options
+):
+    """Return the raw CSV of one station-month, downloading it only if not cached.
+
+    Pass ``cache_dir=None`` to always download and keep nothing on disk.
+    """
+    url = bulk_data_url(station_id, year, month, base_url)
+    if cache_dir is None:
+        return fetch(url, **fetch_options)
+    path = cache_file(station_id, year, month, cache_dir)
+    if path.exists():
+        return path.read_bytes()
+    raw = fetch(url, **fetch_options)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # write under a temporary name of its own first, so an interrupted run
+    # never leaves a truncated month in the cache and two requests for the
+    # same month do not write into the same file
+    fd, partial = tempfile.mkstemp(suffix=".partial", dir=path.parent)
+    with os.fdopen(fd, "wb") as f:
+        f.write(raw)
+    os.replace(partial, path)
+    return raw
+
+
+def download_weather_month(
+    year, month, station_id=MONTREAL_STATION_ID, base_url=BASE_URL, cache_dir=CACHE_DIR
+):
+    """Polars version of chapter 5's ``download_weather_month``, with caching."""
+    return read_month(download_raw_month(station_id, year, month, base_url, cache_dir))
+
+
+def download_weather_months(
+    slices,
+    base_url=BASE_URL,
+    cache_dir=CACHE_DIR,
+    max_workers=8,
+    **fetch_options,
+):
+    """Download many (station_id, year, month) slices concurrently.
+
+    Cached slices are read from disk, the others are fetched by at most
+    ``max_workers`` threads at a time. Returns one cleaned DataFrame per
+    slice, in the order of ``slices``.
+    """
+    slices = list(slices)
+    # a slice asked for twice is downloaded once
+    unique = list(dict.fromkeys(slices))
+
+    def load(key):
+        station_id, year, month = key
+        raw = download_raw_month(
+            station_id, year, month, base_url, cache_dir, **fetch_options
+        )
+        return read_month(raw)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        months = dict(zip(unique, pool.map(load, unique)))
+    return [months[key] for key in slices]
+
+
+def download_weather_year(
+    year,
+    station_id=MONTREAL_STATION_ID,
+    base_url=BASE_URL,
+    cache_dir=CACHE_DIR,
+    **options,
+):
+    """Download all twelve months of ``year`` and concatenate them."""
+    slices = [(station_id, year, month) for month in range(1, 13)]
+    months = download_weather_months(slices, base_url, cache_dir, **options)
+    return pl.concat(months, how="diagonal_relaxed")
+
+
+def partition_path(dataset_dir, station_id, year, month):
+    """Hive-style location of one station-month in a Parquet dataset."""
+    return (
+        Path(dataset_dir)
+        / f"station_id={station_id}"
+        / f"year={year}"
+        / f"month={month}"
+        / "part-0.parquet"
+    )
+
+
+def write_partition(month, path, row_group_size=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".partial")
+    month.write_parquet(partial, statistics=True, row_group_size=row_group_size)
+    partial.replace(path)
+    return path
+
+
+def ingest_weather_months(
+    slices,
+    dataset_dir=DATASET_DIR,
+    base_url=BASE_URL,
+    cache_dir=None,
+    max_workers=4,
+    **fetch_options,
+):
+    """Stream (station_id, year, month) slices into a partitioned Parquet dataset.
+
+    Each worker downloads, cleans and writes one month, then lets go of it,
+    so no more than ``max_workers`` months are ever in memory, however many
+    years are ingested. Nothing is concatenated; read the result back with
+    ``scan_weather_dataset``. Returns the paths of the written files.
+    """
+    slices = list(dict.fromkeys(slices))
+
+    def ingest(key):
+        station_id, year, month = key
+        raw = download_raw_month(
+            station_id, year, month, base_url, cache_dir, **fetch_options
+        )
+        path = partition_path(dataset_dir, station_id, year, month)
+        return write_partition(read_month(raw), path)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(ingest, slices))
+
+
+def scan_weather_dataset(dataset_dir=DATASET_DIR):
+    """Lazily scan a dataset written by ``ingest_weather_months``."""
+    return pl.scan_parquet(
+        Path(dataset_dir) / "**" / "*.parquet", hive_partitioning=True
+    )
+
+
+def write_weather_dataset(
+    weather,
+    dataset_dir=DATASET_DIR,
+    station_id=MONTREAL_STATION_ID,
+    row_group_size=24 * 7,
+):
+    """Lay out an already loaded weather frame as a partitioned Parquet dataset.
+
+    ``weather`` has the columns of ``WEATHER_SCHEMA`` (like
+    ``data/weather_2012.csv``) and optionally a ``station_id`` column; rows
+    without one belong to ``station_id``. Each station-month goes to its
+    ``partition_path``, sorted by time and cut into row groups of a week, so
+    the min/max statistics of every row group let readers skip the weeks a
+    ``date_time`` filter excludes. Returns the paths of the written files.
+    """
+    if "station_id" not in weather.columns:
+        weather = weather.with_columns(pl.lit(station_id).alias("station_id"))
+    weather = weather.with_columns(
+        pl.col("date_time").dt.year().alias("year"),
+        pl.col("date_time").dt.month().alias("month"),
+    )
+    paths = []
+    for (station, year, month), part in weather.partition_by(
+        "station_id", "year", "month", as_dict=True
+    ).items():
+        path = partition_path(dataset_dir, station, year, month)
+        part = part.drop("station_id", "year", "month").sort("date_time")
+        paths.append(write_partition(part, path, row_group_size))
+    return sorted(paths)
+
+
+def _as_datetime(moment):
+    if isinstance(moment, str):
+        return datetime.fromisoformat(moment)
+    if isinstance(moment, date) and not isinstance(moment, datetime):
+        return datetime(moment.year, moment.month, moment.day)
+    return moment
+
+
+def _partition_value(directory):
+    return int(directory.name.partition("=")[2])
+
+
+def month_partitions(dataset_dir=DATASET_DIR, station_ids=None, start=None, end=None):
+    """Files of the station-months that can hold rows of ``start <= date_time < end``.
+
+    Only the directory names are looked at, so partitions outside the
+    requested stations and months are never opened.
+    """
+    start, end = _as_datetime(start), _as_datetime(end)
+    first = (start.year, start.month) if start else None
+    # ``end`` is exclusive: a range ending on the 1st at midnight stops the month before
+    last = None
+    if end:
+        last = (end.year, end.month)
+        if end == datetime(end.year, end.month, 1):
+            last = (end.year - 1, 12) if end.month == 1 else (end.year, end.month - 1)
+    wanted = None if station_ids is None else set(station_ids)
+    files = []
+    for station_dir in sorted(Path(dataset_dir).glob("station_id=*")):
+        if wanted is not None and _partition_value(station_dir) not in wanted:
+            continue
+        for year_dir in sorted(station_dir.glob("year=*")):
+            year = _partition_value(year_dir)
+            if (first and year < first[0]) or (last and year > last[0]):
+                continue
+            for month_dir in sorted(year_dir.glob("month=*")):
+                key = (year, _partition_value(month_dir))
+                if (first and key < first) or (last and key > last):
+                    continue
+                files += sorted(month_dir.glob("*.parquet"))
+    return files
+
+
+def query_weather(
+    *predicates, dataset_dir=DATASET_DIR, station_ids=None, start=None, end=None
+):
+    """Lazily scan only the partitions a query needs.
+
+    Stations and the ``[start, end)`` time range select the station-month
+    files by their paths (see ``month_partitions``); the time range and any
+    further ``predicates``, e.g. ``pl.col("weather").str.contains("Snow")``
+    or ``pl.col("station_name") == "..."``, are then pushed into the
+    Parquet scan, which skips row groups whose statistics rule them out.
+    """
+    files = month_partitions(dataset_dir, station_ids, start, end)
+    if not files:
+        return pl.LazyFrame(
+            schema={
+                **WEATHER_SCHEMA,
+                "station_id": pl.Int64,
+                "year": pl.Int64,
+                "month": pl.Int64,
+            }
+        )
+    lf = pl.scan_parquet(files, hive_partitioning=True)
+    if start is not None:
+        lf = lf.filter(pl.col("date_time") >= _as_datetime(start))
+    if end is not None:
+        lf = lf.filter(pl.col("date_time") < _as_datetime(end))
+    for predicate in predicates:
+        lf = lf.filter(predicate)
+    return lf
+
+
+def _slice_key(station_id, year, month):
+    return f"{station_id}/{year}-{month:02d}"
+
+
+def read_manifest(dataset_dir=DATASET_DIR):
+    """``{"<station>/<year>-<month>": {"path": ..., "rows": ...}}`` of ingested slices."""
+    path = Path(dataset_dir) / MANIFEST_NAME
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def _write_manifest(manifest, dataset_dir):
+    path = Path(dataset_dir) / MANIFEST_NAME
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".partial")
+    partial.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    partial.replace(path)
+
+
+def _parse_and_write(raw, path):
+    # runs in a worker process
+    month = read_month(raw)
+    write_partition(month, Path(path))
+    return month.height
+
+
+def backfill(
+    station_ids,
+    years,
+    dataset_dir=DATASET_DIR,
+    base_url=BASE_URL,
+    cache_dir=None,
+    max_downloads=8,
+    max_parsers=None,
+    **fetch_options,
+):
+    """Ingest every month of ``years`` for every station into the dataset.
+
+    Slices already listed in the dataset's manifest (and still on disk) are
+    skipped, so a rerun only fetches what is new or failed before. Months
+    are downloaded by ``max_downloads`` threads; each download is parsed,
+    cleaned and written by a pool of ``max_parsers`` worker processes (all
+    cores by default), and recorded in the manifest as soon as it is on
+    disk, so an interrupted backfill loses no finished work. New downloads
+    only start as slices finish, so at most ``max_downloads + max_parsers``
+    raw months are held in memory.
+
+    Returns a dict with the ``ingested``, ``skipped`` and ``failed`` slice
+    keys; failures map to their error message.
+    """
+    dataset_dir = Path(dataset_dir)
+    manifest = read_manifest(dataset_dir)
+    slices, skipped = [], []
+    for station_id in station_ids:
+        for year in years:
+            for month in range(1, 13):
+                key = _slice_key(station_id, year, month)
+                entry = manifest.get(key)
+                if entry and (dataset_dir / entry["path"]).exists():
+                    skipped.append(key)
+                else:
+                    slices.append((station_id, year, month))
+
+    ingested, failed = [], {}
+
+    def download(key):
+        station_id, year, month = key
+        return download_raw_month(
+            station_id, year, month, base_url, cache_dir, **fetch_options
+        )
+
+    max_parsers = max_parsers or os.cpu_count()
+    # downloads waiting to be parsed hold their raw bytes, so only start a
+    # new download when a slice is done and fewer than this are in flight
+    max_in_flight = max_downloads + max_parsers
+    remaining = iter(slices)
+    in_flight = {}  # future -> ("download" or "parse", slice)
+    context = multiprocessing.get_context("spawn")
+    with ThreadPoolExecutor(
+        max_workers=max_downloads
+    ) as downloads, ProcessPoolExecutor(
+        max_workers=max_parsers, mp_context=context
+    ) as parsers:
+        while True:
+            while len(in_flight) < max_in_flight:
+                key = next(remaining, None)
+                if key is None:
+                    break
+                in_flight[downloads.submit(download, key)] = ("download", key)
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, key = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed[_slice_key(*key)] = f"{type(e).__name__}: {e}"
+                    continue
+                path = partition_path(dataset_dir, *key)
+                if stage == "download":
+                    parsing = parsers.submit(_parse_and_write, result, str(path))
+                    in_flight[parsing] = ("parse", key)
+                    continue
+                manifest[_slice_key(*key)] = {
+                    "path": str(path.relative_to(dataset_dir)),
+                    "rows": result,
+                }
+                _write_manifest(manifest, dataset_dir)
+                ingested.append(_slice_key(*key))
+    return {"ingested": sorted(ingested), "skipped": skipped, "failed": failed}
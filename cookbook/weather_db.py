@@ -0,0 +1,145 @@
+"""Read and write the hourly temperatures in ``data/weather_2012.sqlite``.
+
+The database holds one table:
+
+    weather_2012(id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 date_time TIMESTAMP, temp DOUBLE PRECISION)
+
+``read_weather`` splits the table into ``id`` ranges and reads them in
+parallel over a small pool of connections, ``iter_weather`` reads it in
+chunks of bounded size, and ``write_weather`` bulk-loads
+``data/weather_2012.csv`` with batched ``executemany`` calls inside a single
+transaction. It writes to ``data/weather_2012_full.sqlite`` by default, so
+the sample database that ships with the cookbook is left alone:
+
+    from weather_db import FULL_DB, read_weather, write_weather
+
+    write_weather()
+    temperatures = read_weather(FULL_DB, partitions=4)
+"""
+
+import queue
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import polars as pl
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+DEFAULT_DB = DATA_DIR / "weather_2012.sqlite"
+# where write_weather loads the whole CSV; not under version control
+FULL_DB = DATA_DIR / "weather_2012_full.sqlite"
+DEFAULT_CSV = DATA_DIR / "weather_2012.csv"
+TABLE = "weather_2012"
+
+CREATE_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date_time TIMESTAMP,
+    temp DOUBLE PRECISION
+)
+"""
+
+SCHEMA = {"id": pl.Int64, "date_time": pl.String, "temp": pl.Float64}
+
+
+class ConnectionPool:
+    """A fixed number of SQLite connections shared between threads."""
+
+    def __init__(self, path=DEFAULT_DB, size=4):
+        self._connections = queue.Queue()
+        for _ in range(size):
+            self._connections.put(sqlite3.connect(path, check_same_thread=False))
+
+    @contextmanager
+    def connection(self):
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _to_frame(rows):
+    frame = pl.DataFrame(rows, schema=SCHEMA, orient="row")
+    return frame.with_columns(pl.col("date_time").str.to_datetime("%Y-%m-%d %H:%M:%S"))
+
+
+def id_ranges(low, high, partitions):
+    """Split the ids ``low..high`` into ``partitions`` contiguous ranges."""
+    step = -(-(high - low + 1) // partitions)
+    return [
+        (start, min(start + step - 1, high)) for start in range(low, high + 1, step)
+    ]
+
+
+def read_weather(path=DEFAULT_DB, partitions=4):
+    """Read the whole table, one ``id`` range per pooled connection.
+
+    The ranges are read concurrently and concatenated in ``id`` order.
+    """
+    with ConnectionPool(path, partitions) as pool:
+        with pool.connection() as conn:
+            low, high = conn.execute(f"SELECT MIN(id), MAX(id) FROM {TABLE}").fetchone()
+        if low is None:
+            return _to_frame([])
+
+        def read_range(bounds):
+            with pool.connection() as conn:
+                rows = conn.execute(
+                    f"SELECT id, date_time, temp FROM {TABLE}"
+                    " WHERE id BETWEEN ? AND ? ORDER BY id",
+                    bounds,
+                ).fetchall()
+            return _to_frame(rows)
+
+        with ThreadPoolExecutor(max_workers=partitions) as executor:
+            frames = list(executor.map(read_range, id_ranges(low, high, partitions)))
+    return pl.concat(frames)
+
+
+def iter_weather(path=DEFAULT_DB, chunk_size=10_000):
+    """Yield the table as DataFrames of at most ``chunk_size`` rows, in ``id`` order."""
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.execute(f"SELECT id, date_time, temp FROM {TABLE} ORDER BY id")
+        while rows := cursor.fetchmany(chunk_size):
+            yield _to_frame(rows)
+    finally:
+        conn.close()
+
+
+def write_weather(csv_path=DEFAULT_CSV, path=FULL_DB, batch_size=10_000, replace=True):
+    """Load the hourly temperatures of ``csv_path`` into the table.
+
+    All batches are inserted with ``executemany`` inside one transaction, so
+    either every row is written or none is. With ``replace`` the existing
+    rows are deleted first (in the same transaction). Returns the number of
+    rows written.
+    """
+    weather = pl.read_csv(csv_path, columns=["date_time", "temperature_c"])
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            conn.execute(CREATE_TABLE)
+            if replace:
+                conn.execute(f"DELETE FROM {TABLE}")
+            for batch in weather.iter_slices(batch_size):
+                conn.executemany(
+                    f"INSERT INTO {TABLE} (date_time, temp) VALUES (?, ?)",
+                    batch.iter_rows(),
+                )
+    finally:
+        conn.close()
+    return weather.height
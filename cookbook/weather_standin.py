@@ -0,0 +1,216 @@
+"""A local stand-in for the Environment Canada bulk weather download.
+
+Chapter 5 downloads one month of hourly weather at a time from
+climate.weather.gc.ca. This serves the same CSV format (UTF-8 with a BOM,
+quoted fields, empty flag columns) from ``data/weather_2012.csv``, so the
+downloader can be exercised without network access:
+
+    python weather_standin.py --port 8000
+
+and then ``weather.download_weather_month(2012, 3, base_url="http://localhost:8000")``.
+
+Any year can be requested; the 2012 readings are reused with the year
+changed. ``latency`` and ``fail_first`` make it slow or flaky on purpose.
+"""
+
+import argparse
+import csv
+import io
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+BULK_DATA_PATH = "/climate_data/bulk_data_e.html"
+
+# Column order of the hourly bulk data download
+HEADER = [
+    "Longitude (x)",
+    "Latitude (y)",
+    "Station Name",
+    "Climate ID",
+    "Date/Time (LST)",
+    "Year",
+    "Month",
+    "Day",
+    "Time (LST)",
+    "Temp (°C)",
+    "Temp Flag",
+    "Dew Point Temp (°C)",
+    "Dew Point Temp Flag",
+    "Rel Hum (%)",
+    "Rel Hum Flag",
+    "Precip. Amount (mm)",
+    "Precip. Amount Flag",
+    "Wind Dir (10s deg)",
+    "Wind Dir Flag",
+    "Wind Spd (km/h)",
+    "Wind Spd Flag",
+    "Visibility (km)",
+    "Visibility Flag",
+    "Stn Press (kPa)",
+    "Stn Press Flag",
+    "Hmdx",
+    "Hmdx Flag",
+    "Wind Chill",
+    "Wind Chill Flag",
+    "Weather",
+]
+
+# Column of weather_2012.csv that fills each column of the download
+SOURCE_COLUMNS = {
+    "Longitude (x)": "longitude",
+    "Latitude (y)": "latitude",
+    "Station Name": "station_name",
+    "Climate ID": "climate_id",
+    "Temp (°C)": "temperature_c",
+    "Dew Point Temp (°C)": "dew_point_temp_c",
+    "Rel Hum (%)": "relative_humidity",
+    "Wind Spd (km/h)": "wind_speed_kmh",
+    "Visibility (km)": "visibility_km",
+    "Stn Press (kPa)": "station_pressure_kpa",
+    "Weather": "weather",
+}
+
+MONTREAL_STATION_ID = 5415
+
+
+def _load_rows(path):
+    """Rows of weather_2012.csv grouped by month number."""
+    by_month = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            by_month.setdefault(int(row["date_time"][5:7]), []).append(row)
+    return by_month
+
+
+def render_month(rows, station_id, year, month):
+    """Render one month as the bytes of an Environment Canada CSV download."""
+    out = io.StringIO()
+    writer = csv.writer(out, quoting=csv.QUOTE_ALL, lineterminator="\n")
+    writer.writerow(HEADER)
+    for row in rows:
+        day, hour = row["date_time"][8:10], row["date_time"][11:16]
+        if month == 2 and day == "29" and not _is_leap(year):
+            continue
+        values = {column: row[source] for column, source in SOURCE_COLUMNS.items()}
+        if station_id != MONTREAL_STATION_ID:
+            values["Station Name"] = f"STATION {station_id}"
+            values["Climate ID"] = str(7000000 + station_id)
+        values["Date/Time (LST)"] = f"{year}-{month:02d}-{day} {hour}"
+        values["Year"] = str(year)
+        values["Month"] = f"{month:02d}"
+        values["Day"] = day
+        values["Time (LST)"] = hour
+        writer.writerow([values.get(column, "") for column in HEADER])
+    return "\ufeff".encode() + out.getvalue().encode()
+
+
+def _is_leap(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+class StandInServer:
+    """Serve Environment Canada style monthly CSVs on a local port.
+
+    Use it as a context manager; ``url`` is the base URL to pass to the
+    downloader and ``requests`` counts the requests per (station, year, month).
+    """
+
+    def __init__(self, port=0, latency=0.0, fail_first=0, source=None):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.requests = Counter()
+        self._months = _load_rows(source or DATA_DIR / "weather_2012.csv")
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                try:
+                    key = (
+                        int(query["stationID"]),
+                        int(query["Year"]),
+                        int(query["Month"]),
+                    )
+                except (KeyError, ValueError):
+                    key = None
+                if (
+                    url.path != BULK_DATA_PATH
+                    or key is None
+                    or key[2] not in range(1, 13)
+                ):
+                    self.send_error(404)
+                    return
+
+                with server._lock:
+                    server.requests[key] += 1
+                    attempt = server.requests[key]
+                time.sleep(server.latency)
+                if attempt <= server.fail_first:
+                    self.send_error(503, "Service Unavailable")
+                    return
+
+                body = render_month(server._months[key[2]], *key)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--fail-first", type=int, default=0)
+    args = parser.parse_args(argv)
+    server = StandInServer(args.port, args.latency, args.fail_first)
+    print(f"Serving Environment Canada stand-in on {server.url}{BULK_DATA_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()